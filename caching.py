@@ -0,0 +1,185 @@
+import functools
+import hashlib
+import sys
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+# Process-wide caches with LRU eviction bounded by entry count and estimated memory, plus a
+# time to live. Keys are short content digests so long screenplays are never kept as keys.
+# Streamlit serves every session from the same process, so the counters cover all users.
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def _digest(*parts):
+    return hashlib.blake2b(b'|'.join(parts), digest_size=16).hexdigest()
+
+
+# Digest of a cache key argument. Containers are hashed item by item and unknown types are refused,
+# a repr would shorten large arrays and let different inputs share a key.
+def content_digest(value):
+    if isinstance(value, str):
+        value = value.encode('utf-8', errors='surrogatepass')
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return hashlib.blake2b(value, digest_size=16).hexdigest()
+    if value is None or isinstance(value, (bool, int, float, complex, np.generic)):
+        return _digest(b'scalar', type(value).__name__.encode(), repr(value).encode())
+    if isinstance(value, np.ndarray):
+        if value.dtype == object:
+            return _digest(b'objects', str(value.shape).encode(), *(content_digest(item).encode() for item in value.ravel()))
+        return _digest(b'array', value.dtype.str.encode(), str(value.shape).encode(), np.ascontiguousarray(value).tobytes())
+    if sparse.issparse(value):
+        value = value.tocsr()
+        return _digest(b'sparse', str(value.shape).encode(), content_digest(value.data).encode(),
+                       content_digest(value.indices).encode(), content_digest(value.indptr).encode())
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        hashed = pd.util.hash_pandas_object(value, index=True).to_numpy()
+        columns = str(list(value.columns)) if isinstance(value, pd.DataFrame) else str(value.name)
+        return hashlib.blake2b(hashed.tobytes() + columns.encode(), digest_size=16).hexdigest()
+    if isinstance(value, dict):
+        # keys of any type, ordered by their digest so insertion order does not matter
+        items = sorted((content_digest(key), content_digest(item)) for key, item in value.items())
+        return _digest(b'dict', *(f'{key}:{item}'.encode() for key, item in items))
+    if isinstance(value, (set, frozenset)):
+        return _digest(b'set', *sorted(content_digest(item).encode() for item in value))
+    if isinstance(value, (list, tuple)):
+        return _digest(type(value).__name__.encode(), *(content_digest(item).encode() for item in value))
+    raise TypeError(f"Cannot digest a {type(value).__name__}, pass arrays, frames, containers or scalars")
+
+
+# Rough memory footprint, precise enough to bound a cache, not to profile it
+def estimate_size(value, _seen=None):
+    if _seen is None:
+        _seen = set()
+    if id(value) in _seen:
+        return 0
+    _seen.add(id(value))
+
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return int(np.sum(value.memory_usage(deep=True)))
+    if sparse.issparse(value):
+        value = value.tocsr()
+        return value.data.nbytes + value.indices.nbytes + value.indptr.nbytes
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(estimate_size(k, _seen) + estimate_size(v, _seen) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(estimate_size(item, _seen) for item in value)
+    elif hasattr(value, '__dict__'):
+        size += estimate_size(vars(value), _seen)
+    return size
+
+
+class BoundedCache:
+
+    def __init__(self, name, max_entries=64, max_bytes=256 * 1024 ** 2, ttl=3600):
+        self.name = name
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _drop(self, key):
+        _, size, _ = self._entries.pop(key)
+        self.bytes -= size
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            value, _, stored_at = entry
+            if self.ttl is not None and time.monotonic() - stored_at > self.ttl:
+                self._drop(key)
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        size = estimate_size(value)
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            # values larger than the whole budget are returned to the caller but never stored
+            if self.max_bytes is not None and size > self.max_bytes:
+                return
+            self._entries[key] = (value, size, time.monotonic())
+            self.bytes += size
+            while self._entries and (len(self._entries) > self.max_entries
+                                     or (self.max_bytes is not None and self.bytes > self.max_bytes)):
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'cache': self.name,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'megabytes': self.bytes / 1024 ** 2,
+                'max_megabytes': None if self.max_bytes is None else self.max_bytes / 1024 ** 2,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations
+            }
+
+
+def get_cache(name, **limits):
+    with _registry_lock:
+        if name not in _registry:
+            _registry[name] = BoundedCache(name, **limits)
+        return _registry[name]
+
+
+def cache_stats():
+    with _registry_lock:
+        caches = list(_registry.values())
+    return pd.DataFrame([cache.stats() for cache in caches])
+
+
+# Memoize a function in a named bounded cache, arguments are keyed by their content digest
+def cached(name, **limits):
+    cache = get_cache(name, **limits)
+
+    def decorator(func):
+        missing = object()
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = content_digest([func.__qualname__, list(args), sorted(kwargs.items())])
+            value = cache.get(key, missing)
+            if value is missing:
+                value = func(*args, **kwargs)
+                cache.set(key, value)
+            return value
+
+        wrapper.cache = cache
+        return wrapper
+
+    return decorator
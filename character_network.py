@@ -0,0 +1,245 @@
+import json
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.sparse.csgraph import shortest_path
+from pyvis.network import Network
+
+# vis.js options for the character network, physics is switched off whenever
+# the node positions have already been computed on the server
+NETWORK_OPTIONS = {
+    "nodes": {
+        "font": {
+            "size": 16,
+            "face": "Verdana",
+            "color": "2E236C"
+        },
+        "borderWidth": 2
+    },
+    "edges": {
+        "color": {
+            "inherit": False
+        },
+        "smooth": False,
+        "font": {
+            "size": 12,
+            "face": "Verdana",
+            "color": "#000000",
+            "strokeWidth": 2,
+            "strokeColor": "#FFFFFF"
+        },
+        "width": 2
+    },
+    "physics": {
+        "enabled": True,
+        "forceAtlas2Based": {
+            "gravitationalConstant": -30,
+            "centralGravity": 0.001,
+            "springLength": 200,
+            "springConstant": 0.001,
+            "damping": 0.5
+        },
+        "solver": "forceAtlas2Based",
+        "stabilization": {
+            "enabled": True,
+            "iterations": 1000,
+            "updateInterval": 25
+        },
+        "minVelocity": 0.5,
+        "maxVelocity": 20
+    },
+    "interaction": {
+        "dragNodes": True,
+        "dragView": True,
+        "zoomView": True
+    }
+}
+
+
+# network modes of the dashboard, None is the original consecutive dialogue network
+NETWORK_MODES = {
+    'Consecutive dialogue': None,
+    'Shared scenes': 'scenes',
+    'Shared dialogue lines': 'lines'
+}
+
+METRIC_COLUMNS = ['average_degree_centrality', 'average_closeness_centrality', 'average_betweenness_centrality',
+                  'average_interaction_diversity', 'normalized_interaction_coefficient']
+
+# sources per block of the betweenness computation, bounds the dense intermediate arrays
+BETWEENNESS_BLOCK = 256
+
+
+# Scene x character matrix: 1 for every scene a character speaks in, or the number of lines with 'lines'
+def scene_incidence(dialogue_df, weighting='scenes'):
+    scene_codes, _ = pd.factorize(dialogue_df['Scene'])
+    character_codes, characters = pd.factorize(dialogue_df['Character'])
+    shape = (scene_codes.max() + 1 if len(scene_codes) else 0, len(characters))
+    # duplicate entries are summed, which counts the lines per scene
+    incidence = sparse.csr_matrix((np.ones(len(scene_codes)), (scene_codes, character_codes)), shape=shape)
+    if weighting == 'scenes':
+        incidence.data[:] = 1
+    return incidence, list(characters)
+
+
+# Co-occurrence counts of all character pairs as one sparse product. With 'scenes' a pair counts
+# the scenes both speak in, with 'lines' the pairs of lines they have within shared scenes.
+def cooccurrence_matrix(dialogue_df, weighting='scenes'):
+    incidence, characters = scene_incidence(dialogue_df, weighting)
+    cooccurrence = (incidence.T @ incidence).tocsr()
+    cooccurrence.setdiag(0)
+    cooccurrence.eliminate_zeros()
+    return cooccurrence, characters
+
+
+# Adjacent speakers in a sequence of dialogue lines, the original interaction network as a sparse matrix
+def dialogue_adjacency(speakers):
+    codes, characters = pd.factorize(pd.Series(list(speakers), dtype=object))
+    first, second = codes[:-1], codes[1:]
+    different = first != second
+    rows = np.concatenate((first[different], second[different]))
+    cols = np.concatenate((second[different], first[different]))
+    adjacency = sparse.csr_matrix((np.ones(len(rows)), (rows, cols)), shape=(len(characters), len(characters)))
+    return adjacency, list(characters)
+
+
+# Weighted edges of the upper triangle, optionally only between the given characters
+def network_edges(matrix, characters, keep=None):
+    upper = sparse.triu(sparse.csr_matrix(matrix), k=1).tocoo()
+    edges = []
+    for i, j, weight in zip(upper.row, upper.col, upper.data):
+        if keep is None or (characters[i] in keep and characters[j] in keep):
+            edges.append((characters[i], characters[j], int(weight)))
+    return tuple(edges)
+
+
+# Brandes' betweenness for all sources at once: breadth first levels as sparse products, then
+# the dependencies are accumulated level by level from the deepest one back to the sources
+def _betweenness(adjacency):
+    n = adjacency.shape[0]
+    betweenness = np.zeros(n)
+    for start in range(0, n, BETWEENNESS_BLOCK):
+        sources = np.arange(start, min(start + BETWEENNESS_BLOCK, n))
+        sigma = np.zeros((len(sources), n))
+        sigma[np.arange(len(sources)), sources] = 1
+        visited = sigma > 0
+        frontier = sigma.copy()
+        levels = [visited.copy()]
+        while True:
+            reached = np.asarray(frontier @ adjacency) * ~visited
+            if not reached.any():
+                break
+            level = reached > 0
+            sigma += reached
+            visited |= level
+            levels.append(level)
+            frontier = reached
+
+        delta = np.zeros_like(sigma)
+        for depth in range(len(levels) - 1, 1, -1):
+            weights = np.where(levels[depth], (1 + delta) / np.where(sigma > 0, sigma, 1), 0)
+            delta += np.asarray(weights @ adjacency) * sigma * levels[depth - 1]
+        betweenness += delta.sum(axis=0)
+    return betweenness
+
+
+# The five network metrics of calculate_screenplay_metrics for any symmetric weighted matrix,
+# with the same networkx definitions (unweighted paths, normalized centralities)
+def network_metrics(matrix):
+    weights = sparse.csr_matrix(matrix, dtype=float)
+    n = weights.shape[0]
+    if n == 0:
+        return pd.DataFrame([dict.fromkeys(METRIC_COLUMNS, 0)])
+    adjacency = (weights > 0).astype(float)
+    degree = np.asarray(adjacency.sum(axis=1)).ravel()
+
+    if n == 1:
+        degree_centrality = np.ones(1)
+        closeness = np.zeros(1)
+        betweenness = np.zeros(1)
+    else:
+        degree_centrality = degree / (n - 1)
+        distances = shortest_path(adjacency, unweighted=True, directed=False)
+        reachable = np.isfinite(distances)
+        total_distance = np.where(reachable, distances, 0).sum(axis=1)
+        others = reachable.sum(axis=1) - 1
+        closeness = np.divide(others * others, total_distance * (n - 1),
+                              out=np.zeros(n), where=total_distance > 0)
+        betweenness = _betweenness(adjacency) / ((n - 1) * (n - 2)) if n > 2 else np.zeros(n)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        normalized_interaction_coefficient = np.float64(weights.sum()) / (n * (n - 1))
+    return pd.DataFrame([{
+        'average_degree_centrality': degree_centrality.mean(),
+        'average_closeness_centrality': closeness.mean(),
+        'average_betweenness_centrality': betweenness.mean(),
+        'average_interaction_diversity': degree.mean(),
+        'normalized_interaction_coefficient': normalized_interaction_coefficient
+    }])
+
+
+# Fruchterman-Reingold layout, all pairwise forces are computed as one numpy array per iteration
+def force_directed_layout(nodes, edges, iterations=150, scale=400.0, seed=42):
+    nodes = list(nodes)
+    n = len(nodes)
+    if n == 0:
+        return {}
+    if n == 1:
+        return {nodes[0]: (0.0, 0.0)}
+
+    index = {node: i for i, node in enumerate(nodes)}
+    adjacency = np.zeros((n, n))
+    for char1, char2, weight in edges:
+        adjacency[index[char1], index[char2]] = weight
+        adjacency[index[char2], index[char1]] = weight
+    # dampen heavy pairs so that the main characters do not collapse onto each other
+    adjacency = np.log1p(adjacency)
+
+    rng = np.random.default_rng(seed)
+    positions = rng.uniform(-1.0, 1.0, size=(n, 2))
+    optimal_distance = np.sqrt(4.0 / n)
+    temperature = 0.2
+    cooling = temperature / (iterations + 1)
+
+    for _ in range(iterations):
+        delta = positions[:, np.newaxis, :] - positions[np.newaxis, :, :]
+        distance = np.linalg.norm(delta, axis=-1)
+        np.clip(distance, 0.01, None, out=distance)
+        # repulsion between every pair, attraction along the edges
+        force = optimal_distance ** 2 / distance ** 2 - adjacency * distance / optimal_distance
+        displacement = np.einsum('ij,ijk->ik', force, delta)
+        length = np.linalg.norm(displacement, axis=1)
+        np.clip(length, 0.01, None, out=length)
+        positions += displacement * (np.minimum(length, temperature) / length)[:, np.newaxis]
+        temperature -= cooling
+
+    positions -= positions.mean(axis=0)
+    extent = np.abs(positions).max()
+    if extent > 0:
+        positions *= scale / extent
+
+    return {node: (float(x), float(y)) for node, (x, y) in zip(nodes, positions)}
+
+
+# Build the Pyvis network and return its html without touching the disk
+def build_network_html(G, positions=None, height="800px"):
+    net = Network(notebook=False, width="100%", height=height, bgcolor="#FFFFFF", font_color="#FFFFFF")
+
+    for node in G.nodes():
+        node_options = {}
+        if positions is not None and node in positions:
+            node_options['x'], node_options['y'] = positions[node]
+        net.add_node(node, label=node, title=node, shape="circle", size=30,
+                     color={"background": "#2E236C", "border": "#C8ACD6"}, **node_options)
+
+    for edge in G.edges(data=True):
+        weight = int(edge[2]['weight'])
+        net.add_edge(edge[0], edge[1], value=weight, title=f"Interactions: {weight}",
+                     label=str(weight), color="#C8ACD6")
+
+    options = json.loads(json.dumps(NETWORK_OPTIONS))
+    if positions is not None:
+        options['physics']['enabled'] = False
+    net.set_options(json.dumps(options))
+
+    return net.generate_html(notebook=False)
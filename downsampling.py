@@ -0,0 +1,46 @@
+import numpy as np
+
+# series longer than this are drawn with WebGL and reduced to this many points
+MAX_POINTS = 1000
+
+
+# Largest-Triangle-Three-Buckets, returns the indices of the points to keep
+def lttb(x, y, threshold):
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    # the first and last points are always kept, the rest is split into threshold - 2 buckets
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    edges = np.append(edges, n)
+
+    selected = np.empty(threshold, dtype=int)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_start, next_end = edges[i + 1], edges[i + 2]
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+        # keep the point forming the largest triangle with the previous pick and the next bucket average
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+
+    return selected
+
+
+# Indices to render for a sorted series, optionally restricted to the zoomed x range
+def downsample_series(x, y, x_range=None, max_points=MAX_POINTS):
+    x = np.asarray(x, dtype=float)
+    indices = np.arange(len(x))
+    if x_range is not None:
+        lo = np.searchsorted(x, x_range[0], side='left')
+        hi = np.searchsorted(x, x_range[1], side='right')
+        indices = indices[lo:hi]
+    if len(indices) > max_points:
+        indices = indices[lttb(x[indices], np.asarray(y, dtype=float)[indices], max_points)]
+    return indices
@@ -0,0 +1,130 @@
+import difflib
+import re
+from collections import Counter
+import numpy as np
+import pandas as pd
+from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+import caching
+from screenplay_features import preprocess_text, statistic_sentiment, analyze_scene_lengths, coherence_classifier
+
+# Incremental analysis of screenplay drafts. Every scene is analysed once and stored under the
+# digest of its text, so a new draft only pays for the scenes that were edited or added. The
+# script level aggregates are then rebuilt from the per-scene results in one linear pass.
+
+SCENE_SEPARATOR = '=' * 50
+
+character_dialogue_pattern = re.compile(r'\n\s*([A-Z][A-Z\s]+)\s*\n\s*([^\n]+)')
+character_name_pattern = re.compile(r'\n\s*([A-Z][A-Z\s]+)\s*\n')
+character_threshold = 5  # number of times a character has to be mentioned
+
+analyzer = SentimentIntensityAnalyzer()
+
+# shared by all drafts and sessions, a scene result is a few hundred bytes
+_scene_cache = caching.get_cache('scene_results', max_entries=50000, max_bytes=64 * 1024 ** 2, ttl=24 * 3600)
+
+
+def analyze_scene(scene):
+    scores = analyzer.polarity_scores(preprocess_text(scene))
+    lines = [line.strip() for line in scene.splitlines() if line.strip()]
+    return {
+        'heading': lines[0][:80] if lines else '',
+        'scores': {
+            'Negative': scores['neg'],
+            'Neutral': scores['neu'],
+            'Positive': scores['pos'],
+            'Compound': scores['compound']
+        },
+        'length': len(scene.strip().split()),
+        'dialogues': [(character.strip(), dialogue) for character, dialogue in character_dialogue_pattern.findall(scene)],
+        'names': Counter(name.strip() for name in character_name_pattern.findall(scene))
+    }
+
+
+# Adjacent speakers across the whole draft, built from the per-scene dialogue lists
+def interaction_matrix_from_scenes(scenes):
+    name_counts = Counter()
+    for scene in scenes:
+        name_counts.update(scene['names'])
+    characters = {name for name, count in name_counts.items() if count > character_threshold}
+    speakers = [character for scene in scenes for character, _ in scene['dialogues'] if character in characters]
+
+    codes, all_characters = pd.factorize(pd.Series(speakers, dtype=object))
+    matrix = np.zeros((len(all_characters), len(all_characters)), dtype=int)
+    if len(codes) > 1:
+        first, second = codes[:-1], codes[1:]
+        different = first != second
+        np.add.at(matrix, (first[different], second[different]), 1)
+        np.add.at(matrix, (second[different], first[different]), 1)
+    return pd.DataFrame(matrix, index=all_characters, columns=all_characters)
+
+
+# Analyse the scenes of a scene separated text, reusing results of the previous draft and the shared cache
+def analyze_draft(scene_separated_text, previous=None):
+    known = {}
+    if previous is not None:
+        known = dict(zip(previous['digests'], previous['scenes']))
+
+    digests = []
+    scenes = []
+    recomputed = 0
+    for chunk in scene_separated_text.split(SCENE_SEPARATOR):
+        digest = caching.content_digest(chunk)
+        result = _scene_cache.get(digest)
+        if result is None:
+            result = known.get(digest)
+            if result is None:
+                result = analyze_scene(chunk)
+                recomputed += 1
+            _scene_cache.set(digest, result)
+        digests.append(digest)
+        scenes.append(result)
+
+    scene_scores = [dict(Scene=i, **scene['scores']) for i, scene in enumerate(scenes)]
+    scene_lengths = [scene['length'] for scene in scenes if scene['length']]
+    scene_length_cv = np.nan
+    if scene_lengths:
+        scene_length_cv = coherence_classifier(*analyze_scene_lengths(scene_lengths))
+
+    return {
+        'digest': caching.content_digest(digests),
+        'digests': digests,
+        'scenes': scenes,
+        'scene_scores': scene_scores,
+        'sentiment': statistic_sentiment(scene_scores),
+        'scene_length_cv': scene_length_cv,
+        'interaction_matrix': interaction_matrix_from_scenes(scenes),
+        'recomputed': recomputed
+    }
+
+
+# Scene level diff between two drafts, one row per added, removed or edited scene
+def compare_drafts(previous, current):
+    matcher = difflib.SequenceMatcher(a=previous['digests'], b=current['digests'], autojunk=False)
+    rows = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            continue
+        for offset in range(max(i2 - i1, j2 - j1)):
+            old = previous['scenes'][i1 + offset] if i1 + offset < i2 else None
+            new = current['scenes'][j1 + offset] if j1 + offset < j2 else None
+            rows.append({
+                'change': 'edited' if old and new else ('removed' if old else 'added'),
+                'previous_scene': i1 + offset if old else None,
+                'scene': j1 + offset if new else None,
+                'heading': (new or old)['heading'],
+                'sentiment_before': old['scores']['Compound'] if old else None,
+                'sentiment_after': new['scores']['Compound'] if new else None,
+                'words_before': old['length'] if old else None,
+                'words_after': new['length'] if new else None
+            })
+    return pd.DataFrame(rows, columns=['change', 'previous_scene', 'scene', 'heading', 'sentiment_before',
+                                       'sentiment_after', 'words_before', 'words_after'])
+
+
+def summarize_drafts(previous, current):
+    metrics = ['Scenes', 'Characters', 'Average sentiment', 'Sentiment deviation', 'Sentiment turns', 'Scene length CV']
+
+    def values(draft):
+        return [len(draft['scenes']), len(draft['interaction_matrix']), *draft['sentiment'], draft['scene_length_cv']]
+
+    return pd.DataFrame({'metric': metrics, 'previous draft': values(previous), 'current draft': values(current)})
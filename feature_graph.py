@@ -0,0 +1,139 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import numpy as np
+import pandas as pd
+import textstat
+import screenplay_features
+
+# The prediction as a graph of named stages. Every stage declares the values it reads, stages
+# whose inputs are ready run side by side in a thread pool and the branches join at clf_stack.
+# The heavy parts of NumPy, SciPy and scikit-learn release the GIL; the pure Python stages
+# (VADER, TextBlob, the networkx metrics) still take turns, so the gain is largest on long scripts.
+
+MAX_WORKERS = int(os.environ.get('REEL_GRAPH_WORKERS', min(8, os.cpu_count() or 1)))
+
+# shared by all sessions, stages never submit work themselves so the pool cannot deadlock
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='feature-graph')
+
+
+def _script_features(scene_length_cv, sentiment, readability, polarity, lda_text, screenplay_metrics):
+    # same columns in the same order as screenplay_features.extract_text_features
+    df = pd.DataFrame({'scene_length_cv': [scene_length_cv]})
+    df[['sentiment_score_average', 'sentiment_score_mean_squared_deviation', 'rel_sent_turns']] = sentiment
+    df['flesch_reading_ease'], df['flesch_kincaid_grade'] = readability
+    df['polarity'] = polarity['polarity']
+    df['subjectivity'] = polarity['subjectivity']
+    df_lda = pd.DataFrame(lda_text, columns=[f'topic_{i}' for i in range(lda_text.shape[1])])
+    return pd.concat([df, df_lda, screenplay_metrics], axis=1)
+
+
+def _stack(n_rows, y_pred_tfidf, y_pred_lsa, y_pred_glove, y_pred_combined, models):
+    # the text models see the script only, their prediction is shared by every metadata row
+    if n_rows > 1:
+        y_pred_tfidf, y_pred_lsa, y_pred_glove = [np.repeat(y_pred, n_rows, axis=0) for y_pred in (y_pred_tfidf, y_pred_lsa, y_pred_glove)]
+    return models['clf_stack'].predict_proba(np.column_stack((y_pred_tfidf, y_pred_lsa, y_pred_glove, y_pred_combined)))
+
+
+# name -> (inputs, function), the function gets the input values in the declared order
+STAGES = {
+    'scene_separated_text': (('raw_text',), screenplay_features.process_screenplay),
+    'screenplay_metrics': (('raw_text',), screenplay_features.calculate_screenplay_metrics),
+    'scene_scores': (('scene_separated_text',), screenplay_features.classify_and_save_scenes),
+    'scene_length_cv': (('scene_separated_text',), screenplay_features.process_scene_lengths),
+    'sentiment': (('scene_scores',), screenplay_features.statistic_sentiment),
+    'clean_text': (('raw_text',), screenplay_features.clean_script_text),
+    'lem_text': (('clean_text',), screenplay_features.lemmatized_script_text),
+    'tfidf_text': (('lem_text', 'models'), lambda text, models: models['tfidf'].transform([text])),
+    'lsa_text': (('tfidf_text', 'models'), lambda tfidf_text, models: models['lsa'].transform(tfidf_text)),
+    'count_text': (('clean_text', 'models'), lambda text, models: models['counts'].transform([text])),
+    'lda_text': (('count_text', 'models'), lambda count_text, models: models['lda'].transform(count_text)),
+    'glove_text': (('clean_text', 'embeddings_index'),
+                   lambda text, embeddings_index: np.vstack([screenplay_features.get_script_embedding(text, embeddings_index)])),
+    'readability': (('clean_text',), lambda text: (textstat.flesch_reading_ease(text), textstat.flesch_kincaid_grade(text))),
+    'polarity': (('clean_text',), screenplay_features.sentiment_features),
+    'script_features': (('scene_length_cv', 'sentiment', 'readability', 'polarity', 'lda_text', 'screenplay_metrics'), _script_features),
+    # prediction, df holds the user metadata next to the script features
+    'model_frame': (('df', 'models'), screenplay_features.model_frame),
+    'y_pred_tfidf': (('tfidf_text', 'models'), lambda tfidf_text, models: models['clf_tfidf'].predict_proba(tfidf_text)),
+    'y_pred_lsa': (('lsa_text', 'models'), lambda lsa_text, models: models['clf_lsa'].predict_proba(lsa_text)),
+    'y_pred_glove': (('glove_text', 'models'), lambda glove_text, models: models['clf_glove'].predict_proba(glove_text)),
+    'y_pred_combined': (('model_frame', 'models'), lambda df, models: models['clf_combined'].predict_proba(df)),
+    'n_rows': (('df',), len),
+    'clf_stack': (('n_rows', 'y_pred_tfidf', 'y_pred_lsa', 'y_pred_glove', 'y_pred_combined', 'models'), _stack)
+}
+
+# stages that tokenize or lemmatize with NLTK, its corpora are loaded before they run side by side
+NLTK_STAGES = {'scene_scores', 'lem_text'}
+
+TEXT_OUTPUTS = ['scene_separated_text', 'scene_scores', 'clean_text', 'tfidf_text', 'lsa_text', 'lda_text',
+                'glove_text', 'script_features']
+
+
+# Stages needed for the targets, skipping everything that is already among the values
+def required_stages(targets, values, stages=STAGES):
+    required = []
+    pending = list(targets)
+    while pending:
+        name = pending.pop()
+        if name in values or name in required:
+            continue
+        if name not in stages:
+            raise KeyError(f"No stage produces '{name}'")
+        required.append(name)
+        pending.extend(stages[name][0])
+    return required
+
+
+# Run the stages the targets depend on, returns all values and the seconds spent in each stage
+def run_graph(targets, values, stages=STAGES, executor=None):
+    executor = executor or _executor
+    values = dict(values)
+    waiting = set(required_stages(targets, values, stages))
+    if waiting & NLTK_STAGES:
+        screenplay_features.ensure_nltk_loaded()
+    timings = {}
+    running = {}
+
+    def timed(name, function, arguments):
+        start = time.perf_counter()
+        result = function(*arguments)
+        timings[name] = time.perf_counter() - start
+        return result
+
+    try:
+        while waiting or running:
+            for name in [name for name in waiting if all(value in values for value in stages[name][0])]:
+                inputs, function = stages[name]
+                running[executor.submit(timed, name, function, [values[value] for value in inputs])] = name
+                waiting.discard(name)
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                values[running.pop(future)] = future.result()
+    finally:
+        # a failed stage stops the run, branches that have not started yet are dropped
+        for future in running:
+            future.cancel()
+    return values, timings
+
+
+# Same result as screenplay_features.extract_text_features, with the branches running concurrently
+def extract_text_features(raw_text, models, embeddings_index, scene_separated_text=None, scene_scores=None,
+                          scene_length_cv=None):
+    values = {'raw_text': raw_text, 'models': models, 'embeddings_index': embeddings_index}
+    if scene_separated_text is not None:
+        values['scene_separated_text'] = scene_separated_text
+    # scene scores of an earlier draft analysis can be passed in to skip VADER
+    if scene_scores is not None:
+        values['scene_scores'] = scene_scores
+    if scene_length_cv is not None:
+        values['scene_length_cv'] = scene_length_cv
+    values, _ = run_graph(TEXT_OUTPUTS, values)
+    return {name: values[name] for name in TEXT_OUTPUTS}
+
+
+# Same result as screenplay_features.predict_success, the four classifiers run concurrently
+def predict_success(text_features, df, models):
+    values = dict(text_features, df=df, models=models)
+    values, _ = run_graph(['clf_stack'], values)
+    return values['clf_stack']
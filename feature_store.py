@@ -0,0 +1,141 @@
+import argparse
+import hashlib
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import nltk
+nltk.download('stopwords')
+nltk.download('punkt')
+nltk.download('wordnet')
+nltk.download('omw-1.4')
+import pandas as pd
+import ingestion
+import screenplay_features
+
+# Columnar store of the features Home.py derives from a screenplay, one row per script.
+# Usage: python feature_store.py path/to/screenplays --output data/feature_store.parquet
+
+SCRIPT_EXTENSIONS = tuple(f'.{file_type}' for file_type in ingestion.SUPPORTED_TYPES)
+KEY_COLUMNS = ['script', 'content_hash']
+
+# models are loaded once per process, forked workers share the parent's copy
+_models = None
+_embeddings_index = None
+
+def _init_worker(model_dir, glove_path):
+    global _models, _embeddings_index
+    if _models is None:
+        _models = screenplay_features.load_models(model_dir)
+        _embeddings_index = screenplay_features.load_glove_embeddings(glove_path)
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+def vector_columns(prefix, vector):
+    return {f'{prefix}_{i}': float(value) for i, value in enumerate(vector)}
+
+# Flatten the text features of one script into a single store row
+def feature_row(text_features):
+    row = text_features['script_features'].iloc[0].to_dict()
+    row.update(vector_columns('tfidf', text_features['tfidf_text'].toarray()[0]))
+    row.update(vector_columns('lsa', text_features['lsa_text'][0]))
+    row.update(vector_columns('glove', text_features['glove_text'][0]))
+    return row
+
+def _extract(file_name, data):
+    raw_text = ingestion.read_screenplay(file_name, data)['text']
+    text_features = screenplay_features.extract_text_features(raw_text, _models, _embeddings_index)
+    return feature_row(text_features)
+
+def list_scripts(corpus_dir):
+    paths = []
+    for root, _, files in os.walk(corpus_dir):
+        for file_name in files:
+            if file_name.lower().endswith(SCRIPT_EXTENSIONS):
+                paths.append(os.path.join(root, file_name))
+    return sorted(paths)
+
+def load_feature_store(path):
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=KEY_COLUMNS)
+    return pd.read_parquet(path)
+
+# Recompute only new or edited scripts, rows of unchanged content are carried over
+def build_feature_store(corpus_dir, output_path, model_dir='models', glove_path=None, workers=None):
+    existing = load_feature_store(output_path)
+    known = {row['content_hash']: row for row in existing.to_dict('records')}
+
+    rows = []
+    pending = []
+    for path in list_scripts(corpus_dir):
+        script = os.path.relpath(path, corpus_dir)
+        with open(path, 'rb') as f:
+            data = f.read()
+        digest = content_hash(data)
+        if digest in known:
+            rows.append(dict(known[digest], script=script))
+        else:
+            pending.append((script, digest, data))
+
+    failed = []
+    if pending:
+        if glove_path is None:
+            glove_path = screenplay_features.download_glove_embeddings()
+        # load in the parent first so that forked workers start warm
+        _init_worker(model_dir, glove_path)
+        context = None
+        if 'fork' in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context('fork')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                 initializer=_init_worker, initargs=(model_dir, glove_path)) as pool:
+            futures = {pool.submit(_extract, script, data): (script, digest) for script, digest, data in pending}
+            for future in as_completed(futures):
+                script, digest = futures[future]
+                try:
+                    row = future.result()
+                except Exception as e:
+                    print(f"Skipping {script}: {e}")
+                    failed.append(script)
+                    continue
+                row['script'] = script
+                row['content_hash'] = digest
+                rows.append(row)
+
+    store = pd.DataFrame(rows)
+    if not store.empty:
+        feature_columns = [column for column in store.columns if column not in KEY_COLUMNS]
+        store = store[KEY_COLUMNS + feature_columns].sort_values('script').reset_index(drop=True)
+
+    # write next to the target and swap, so readers never see a half written file
+    output_dir = os.path.dirname(output_path)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    tmp_path = output_path + '.tmp'
+    store.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, output_path)
+
+    stats = {
+        'scripts': len(store),
+        'reused': len(rows) - (len(pending) - len(failed)),
+        'computed': len(pending) - len(failed),
+        'failed': len(failed)
+    }
+    return store, stats
+
+def main():
+    parser = argparse.ArgumentParser(description='Build or refresh the screenplay feature store.')
+    parser.add_argument('corpus_dir', help='directory with screenplay files')
+    parser.add_argument('--output', default=os.path.join('data', 'feature_store.parquet'))
+    parser.add_argument('--models', default='models', help='directory with the pickled models')
+    parser.add_argument('--glove', default=None, help='path to glove.6B.300d.txt')
+    parser.add_argument('--workers', type=int, default=None, help='number of worker processes')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    _, stats = build_feature_store(args.corpus_dir, args.output, args.models, args.glove, args.workers)
+    print(f"{stats['scripts']} scripts in {args.output}: {stats['computed']} computed, "
+          f"{stats['reused']} unchanged, {stats['failed']} failed ({time.perf_counter() - start:.1f}s)")
+
+if __name__ == '__main__':
+    main()
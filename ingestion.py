@@ -0,0 +1,165 @@
+import io
+import os
+import re
+import xml.etree.ElementTree as ET
+import numpy as np
+import pandas as pd
+from charset_normalizer import from_bytes
+from screenplay_features import identify_scenes
+
+# Screenplay ingestion. Final Draft (.fdx) files are streamed through the XML parser and read
+# paragraph by paragraph; plain text is decoded and segmented with the existing heuristics.
+# Both paths give the same element table (scene, kind, character, text) plus the screenplay
+# text that the feature extraction consumes.
+
+SUPPORTED_TYPES = ['txt', 'fdx']
+ELEMENT_COLUMNS = ['scene', 'kind', 'character', 'text']
+
+# only this much of a non UTF-8 file is handed to the encoding detection
+DETECTION_SAMPLE_BYTES = 64 * 1024
+
+FDX_KINDS = {
+    'Scene Heading': 'scene_heading',
+    'Action': 'action',
+    'Character': 'character',
+    'Dialogue': 'dialogue',
+    'Parenthetical': 'parenthetical',
+    'Transition': 'transition',
+    'Shot': 'action',
+    'General': 'action'
+}
+
+character_dialogue_pattern = re.compile(r'\n\s*([A-Z][A-Z\s]+)\s*\n\s*([^\n]+)')
+character_extension_pattern = re.compile(r'\s*\(.*?\)\s*')
+
+
+class ScreenplayError(Exception):
+    pass
+
+
+# UTF-8 first, detection on a sample only when that fails
+def decode_text(data):
+    try:
+        return data.decode('utf-8-sig'), 'utf-8'
+    except UnicodeDecodeError:
+        pass
+    best = from_bytes(data[:DETECTION_SAMPLE_BYTES]).best()
+    encoding = best.encoding if best is not None else 'latin-1'
+    return data.decode(encoding, errors='replace'), encoding
+
+
+def _character_name(text):
+    # drop extensions such as (V.O.) or (CONT'D), the cue has to be plain caps for the analysis
+    return character_extension_pattern.sub(' ', text).strip().upper()
+
+
+def parse_fdx(stream):
+    try:
+        return _parse_fdx(stream)
+    except ET.ParseError as e:
+        raise ScreenplayError(f"The Final Draft file is not valid XML ({e}).")
+
+
+def _parse_fdx(stream):
+    rows = []
+    scene = 0
+    character = None
+    path = []
+    for event, elem in ET.iterparse(stream, events=('start', 'end')):
+        if event == 'start':
+            path.append(elem.tag)
+            continue
+        path.pop()
+        # paragraphs of the title page and headers live outside the main Content block
+        if elem.tag != 'Paragraph' or 'TitlePage' in path or 'Content' not in path:
+            if elem.tag in ('Content', 'TitlePage'):
+                elem.clear()
+            continue
+
+        text = ''.join(part.text or '' for part in elem.findall('Text')).strip()
+        kind = FDX_KINDS.get(elem.get('Type'), 'action')
+        if text:
+            if kind == 'scene_heading':
+                scene += 1
+                character = None
+            elif kind == 'character':
+                character = _character_name(text)
+            elif kind not in ('dialogue', 'parenthetical'):
+                character = None
+            rows.append((scene, kind, character if kind in ('character', 'dialogue', 'parenthetical') else None, text))
+        elem.clear()
+
+    return pd.DataFrame(rows, columns=ELEMENT_COLUMNS)
+
+
+# Screenplay text in the layout the scene and dialogue heuristics expect
+def elements_to_text(elements):
+    blocks = []
+    speech = None
+    for kind, character, text in elements[['kind', 'character', 'text']].itertuples(index=False):
+        if kind in ('dialogue', 'parenthetical') and speech is not None:
+            speech[1].append(' '.join(text.split()))
+            continue
+        if speech is not None:
+            blocks.append(f"{speech[0]}\n{' '.join(speech[1])}")
+            speech = None
+        if kind == 'character':
+            speech = (character, [])
+        elif kind in ('scene_heading', 'transition'):
+            blocks.append(text.upper())
+        else:
+            blocks.append(text)
+    if speech is not None:
+        blocks.append(f"{speech[0]}\n{' '.join(speech[1])}")
+    return '\n\n' + '\n\n'.join(blocks) + '\n'
+
+
+# Element table of a plain text screenplay from the scene and dialogue patterns the analysis uses
+def text_elements(text):
+    # identify_scenes lists the regex headings before the uppercase ones, so every heading is
+    # searched on its own; a heading listed again is its next occurrence in the text
+    found = {}
+    for match in identify_scenes(text):
+        heading = match.split(' SCENE')[0]
+        previous = found.get(heading)
+        position = text.find(heading, 0 if previous is None else previous[-1] + len(heading))
+        if position >= 0:
+            found.setdefault(heading, []).append(position)
+    heading_positions = {}
+    for heading, positions in found.items():
+        for position in positions:
+            heading_positions.setdefault(position, heading.strip())
+    heading_positions = sorted(heading_positions.items())
+    starts = np.array([position for position, _ in heading_positions], dtype=np.int64)
+
+    rows = [(i + 1, 'scene_heading', None, heading) for i, (_, heading) in enumerate(heading_positions)]
+    for match in character_dialogue_pattern.finditer(text):
+        scene = int(np.searchsorted(starts, match.start(1), side='right'))
+        rows.append((scene, 'dialogue', match.group(1), match.group(2)))
+    rows.sort(key=lambda row: (row[0], row[1] != 'scene_heading'))
+    return pd.DataFrame(rows, columns=ELEMENT_COLUMNS)
+
+
+def read_screenplay(file_name, data):
+    extension = os.path.splitext(file_name)[1].lower().lstrip('.')
+    if extension == 'fdx':
+        elements = parse_fdx(io.BytesIO(data))
+        return {'format': 'fdx', 'encoding': 'xml', 'text': elements_to_text(elements), 'elements': elements}
+    text, encoding = decode_text(data)
+    return {'format': 'txt', 'encoding': encoding, 'text': text, 'elements': None}
+
+
+# Element table for either format, plain text is only segmented when someone asks for it
+def screenplay_elements(screenplay):
+    if screenplay['elements'] is None:
+        screenplay['elements'] = text_elements(screenplay['text'])
+    return screenplay['elements']
+
+
+# Dialogue lines in script order, the same rows the character dialogue regex finds in plain text,
+# with the number of the scene each line belongs to
+def dialogue_frame(screenplay):
+    elements = screenplay_elements(screenplay)
+    dialogues = elements[elements['kind'] == 'dialogue']
+    return pd.DataFrame({'Character': dialogues['character'].to_numpy(), 'Dialogue': dialogues['text'].to_numpy(),
+                         'Scene': dialogues['scene'].to_numpy()})
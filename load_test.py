@@ -0,0 +1,341 @@
+import argparse
+import asyncio
+import io
+import os
+import random
+import subprocess
+import sys
+import time
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import requests
+import websockets
+from streamlit.proto.Alert_pb2 import Alert
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+# Load test for the Streamlit pages. Every level starts one real `streamlit run Home.py` server and
+# connects that many concurrent clients to it. A client speaks the browser's websocket protocol:
+# it loads Home, uploads a synthetic screenplay with random metadata, clicks "Get Success
+# Prediction", switches to the dashboard and clicks "Create Visualization". All sessions share the
+# server's threads, GIL, st.cache_resource models and bounded caches, so the reported RSS and
+# cache hit rates are the server's. Raise the concurrency until throughput stops growing to find
+# the knee.
+# Usage: python load_test.py --concurrency 1 2 4 8 --sessions 3 --scenes 40 --output load_test.csv
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+HOME_PAGE = os.path.join(APP_DIR, 'Home.py')
+DASHBOARD_PAGE = 'Visualization Dashboard'
+UPLOAD_LABEL = 'Choose a text or Final Draft file'
+ACTIONS = ['page load', 'prediction', 'visualization']
+BUDGETS = [1_000_000, 10_000_000, 50_000_000, 150_000_000]
+RUN_TIMES = [85, 100, 120, 150]
+
+
+class SessionError(Exception):
+    pass
+
+
+# One browser tab: a websocket session that reruns pages with widget values like the frontend does
+class BrowserSession:
+
+    def __init__(self, url, timeout):
+        self.url = url
+        self.timeout = timeout
+        self.websocket = None
+        self.session_id = None
+        self.pages = {}
+        self.page_hash = None
+        self.elements = {}
+        # values of the widgets the user changed, sent with every rerun like the frontend keeps them
+        self.values = {}
+
+    async def connect(self):
+        self.websocket = await websockets.connect(self.url.replace('http', 'ws', 1) + '/_stcore/stream',
+                                                  subprotocols=['streamlit'], max_size=None)
+
+    async def close(self):
+        if self.websocket is not None:
+            await self.websocket.close()
+
+    async def _receive(self):
+        message = ForwardMsg()
+        message.ParseFromString(await self.websocket.recv())
+        kind = message.WhichOneof('type')
+        if kind == 'new_session':
+            self.session_id = message.new_session.initialize.session_id
+            self.page_hash = message.new_session.page_script_hash
+            self.elements = {}
+        elif kind == 'navigation':
+            self.pages = {page.page_name: page.page_script_hash for page in message.navigation.app_pages}
+        elif kind == 'delta' and message.delta.WhichOneof('type') == 'new_element':
+            self.elements[tuple(message.metadata.delta_path)] = message.delta.new_element
+        return kind, message
+
+    # Rerun the page and wait until the script has finished, an exception or error message fails the run
+    async def run(self, page=None, trigger=None):
+        back = BackMsg()
+        state = back.rerun_script
+        # a first load sets no field at all, the message still has to be a rerun
+        state.SetInParent()
+        if page is not None:
+            state.page_script_hash = self.pages[page]
+        elif self.page_hash:
+            state.page_script_hash = self.page_hash
+        for value in self.values.values():
+            state.widget_states.widgets.add().CopyFrom(value)
+        if trigger is not None:
+            button = state.widget_states.widgets.add()
+            button.id = trigger
+            button.trigger_value = True
+        await self.websocket.send(back.SerializeToString())
+        await asyncio.wait_for(self._wait_finished(), self.timeout)
+        for element in self.elements.values():
+            if element.WhichOneof('type') == 'exception':
+                raise SessionError(element.exception.message)
+            if element.WhichOneof('type') == 'alert' and element.alert.format == Alert.ERROR:
+                raise SessionError(element.alert.body)
+
+    async def _wait_finished(self):
+        while True:
+            kind, message = await self._receive()
+            # a rerun requested by the script itself starts over
+            if kind == 'script_finished' and message.script_finished != ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                return
+
+    def widget(self, kind, label):
+        for element in self.elements.values():
+            if element.WhichOneof('type') == kind and getattr(element, kind).label == label:
+                return getattr(element, kind)
+        raise SessionError(f"No {kind} labelled '{label}'")
+
+    def set_value(self, kind, label, field, value):
+        widget = self.widget(kind, label)
+        state = self.values.setdefault(widget.id, WidgetState(id=widget.id))
+        target = getattr(state, field)
+        if isinstance(value, list):
+            target.data[:] = value
+        else:
+            setattr(state, field, value)
+
+    def click(self, label):
+        return self.widget('button', label).id
+
+    # The upload goes over HTTP like in the browser, the widget then only carries the file id
+    async def upload(self, label, file_name, data):
+        widget = self.widget('file_uploader', label)
+        back = BackMsg()
+        back.file_urls_request.request_id = file_name
+        back.file_urls_request.file_names.append(file_name)
+        back.file_urls_request.session_id = self.session_id
+        await self.websocket.send(back.SerializeToString())
+        while True:
+            kind, message = await asyncio.wait_for(self._receive(), self.timeout)
+            if kind == 'file_urls_response' and message.file_urls_response.response_id == file_name:
+                break
+        if message.file_urls_response.error_msg:
+            raise SessionError(message.file_urls_response.error_msg)
+        urls = message.file_urls_response.file_urls[0]
+        response = await asyncio.to_thread(requests.put, self.url + urls.upload_url,
+                                           files={'file': (file_name, data, 'text/plain')}, timeout=self.timeout)
+        response.raise_for_status()
+        state = WidgetState(id=widget.id)
+        info = state.file_uploader_state_value.uploaded_file_info.add()
+        info.file_id, info.name, info.size = urls.file_id, file_name, len(data)
+        info.file_urls.CopyFrom(urls)
+        self.values[widget.id] = state
+
+    def dataframes(self):
+        for element in self.elements.values():
+            if element.WhichOneof('type') == 'dataframe' and element.dataframe.arrow_data.data:
+                yield pa.ipc.open_stream(io.BytesIO(element.dataframe.arrow_data.data)).read_pandas()
+
+
+async def run_session(url, client, session, scenes, seed, timeout, records):
+    import screenplay_features
+    import warmup
+    rng = random.Random(seed)
+    text = warmup.synthetic_screenplay(scenes, seed).encode('utf-8')
+    browser = BrowserSession(url, timeout)
+
+    async def timed(action, function):
+        start = time.time()
+        try:
+            await function()
+            error = None
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        records.append({'client': client, 'session': session, 'action': action, 'start': start,
+                        'seconds': time.time() - start, 'error': error})
+        return error is None
+
+    async def load():
+        await browser.connect()
+        await browser.run()
+
+    async def predict():
+        # the dashboard keys its results by file name, every session uploads its own script
+        await browser.upload(UPLOAD_LABEL, f'load_test_{client}_{session}.txt', text)
+        browser.set_value('number_input', 'Production Budget in US$', 'double_value', float(rng.choice(BUDGETS)))
+        browser.set_value('multiselect', 'Genre (max. 3)', 'string_array_value',
+                          rng.sample(screenplay_features.genre_list, rng.randint(1, 3)))
+        browser.set_value('selectbox', 'Age Rating', 'string_value', str(rng.choice(screenplay_features.age_list)))
+        browser.set_value('slider', 'Runtime in min', 'double_array_value', [float(rng.choice(RUN_TIMES))])
+        await browser.run(trigger=browser.click('Get Success Prediction'))
+
+    async def visualize():
+        # widgets of the Home page are gone after the page switch
+        browser.values = {}
+        await browser.run(page=DASHBOARD_PAGE)
+        await browser.run(trigger=browser.click('Create Visualization'))
+
+    try:
+        if await timed('page load', load) and await timed('prediction', predict):
+            await timed('visualization', visualize)
+    finally:
+        await browser.close()
+
+
+# One client plays its sessions in a row, like a user opening a new tab for every script
+async def run_client(url, client, sessions, scenes, seed, timeout, records):
+    for session in range(sessions):
+        await run_session(url, client, session, scenes, seed + client * 1000 + session, timeout, records)
+
+
+# The bounded caches of the server, from the Diagnostics table of a fresh Home page session
+async def server_caches(url, timeout):
+    browser = BrowserSession(url, timeout)
+    await browser.connect()
+    try:
+        await browser.run()
+    finally:
+        await browser.close()
+    for frame in browser.dataframes():
+        if {'cache', 'hits', 'misses'} <= set(frame.columns):
+            return frame[['cache', 'hits', 'misses']]
+    return pd.DataFrame(columns=['cache', 'hits', 'misses'])
+
+
+# Resident and peak memory of the server process in MB, from /proc on Linux
+def process_memory(pid):
+    memory = {'rss_mb': np.nan, 'peak_rss_mb': np.nan}
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                name, _, value = line.partition(':')
+                if name in ('VmRSS', 'VmHWM'):
+                    memory['rss_mb' if name == 'VmRSS' else 'peak_rss_mb'] = int(value.split()[0]) / 1024
+    except OSError:
+        pass
+    return memory
+
+
+# Bytes held by st.cache_resource and st.cache_data, from the server's metrics endpoint
+def streamlit_cache_mb(url):
+    response = requests.get(url + '/_stcore/metrics', params={'families': 'cache_memory_bytes'}, timeout=30)
+    response.raise_for_status()
+    return sum(float(line.rsplit(' ', 1)[1]) for line in response.text.splitlines()
+               if line.startswith('cache_memory_bytes{')) / 1024 ** 2
+
+
+def start_server(port, log, timeout):
+    command = [sys.executable, '-m', 'streamlit', 'run', HOME_PAGE, '--server.headless', 'true',
+               '--server.port', str(port), '--server.fileWatcherType', 'none',
+               '--server.enableXsrfProtection', 'false', '--browser.gatherUsageStats', 'false']
+    server = subprocess.Popen(command, cwd=APP_DIR, stdout=log, stderr=subprocess.STDOUT)
+    url = f'http://localhost:{port}'
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"Streamlit server exited with code {server.returncode}")
+        try:
+            if requests.get(url + '/_stcore/health', timeout=1).ok:
+                return server, url
+        except requests.ConnectionError:
+            pass
+        time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError(f"Streamlit server did not come up on port {port}")
+
+
+# One level: a freshly started server, like after a deploy, and that many concurrent clients
+def run_level(concurrency, sessions, scenes, seed, timeout, port, log):
+    server, url = start_server(port, log, timeout)
+    try:
+        records = []
+
+        async def play():
+            await asyncio.gather(*[run_client(url, client, sessions, scenes, seed, timeout, records)
+                                   for client in range(concurrency)])
+            return await server_caches(url, timeout)
+
+        caches = asyncio.run(play())
+        process = dict(process_memory(server.pid), st_cache_mb=streamlit_cache_mb(url))
+    finally:
+        server.terminate()
+        server.wait()
+    records = pd.DataFrame(records)
+    records['concurrency'] = concurrency
+    return records, process, caches
+
+
+def summarize(concurrency, sessions, records, process, caches):
+    summary = {'concurrency': concurrency, 'sessions': concurrency * sessions,
+               'errors': int(records['error'].notna().sum())}
+    # completed prediction and visualization clicks per second, page loads are the cold start
+    work = records[records['action'] != 'page load']
+    done = work[work['error'].isna()]
+    elapsed = (work['start'] + work['seconds']).max() - work['start'].min() if len(work) else 0
+    summary['throughput_per_s'] = len(done) / elapsed if elapsed else 0.0
+    for action in ACTIONS:
+        seconds = records.loc[(records['action'] == action) & records['error'].isna(), 'seconds']
+        for percentile in (50, 90, 99):
+            summary[f'{action} p{percentile}_s'] = np.percentile(seconds, percentile) if len(seconds) else np.nan
+    summary.update(process)
+    lookups = caches['hits'] + caches['misses']
+    for cache, hit_rate in zip(caches['cache'], caches['hits'] / lookups.where(lookups > 0)):
+        summary[f'hit_rate {cache}'] = hit_rate
+    return summary
+
+
+def run_load_test(levels, sessions, scenes, seed, timeout, port, log=subprocess.DEVNULL):
+    summaries = []
+    all_records = []
+    for concurrency in levels:
+        records, process, caches = run_level(concurrency, sessions, scenes, seed, timeout, port, log)
+        summaries.append(summarize(concurrency, sessions, records, process, caches))
+        all_records.append(records)
+        print(f"{concurrency} concurrent sessions: {summaries[-1]['throughput_per_s']:.2f} actions/s, {summaries[-1]['errors']} errors")
+    summary = pd.DataFrame(summaries)
+    # throughput per session relative to the lowest level, it falls off past the knee
+    baseline = summary['throughput_per_s'].iloc[0] / summary['concurrency'].iloc[0]
+    summary['scaling_efficiency'] = summary['throughput_per_s'] / (summary['concurrency'] * baseline) if baseline else np.nan
+    return summary, pd.concat(all_records, ignore_index=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Drive concurrent browser sessions against one Streamlit server.')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 2, 4, 8], help='concurrent sessions per level')
+    parser.add_argument('--sessions', type=int, default=3, help='sessions every client plays in a row')
+    parser.add_argument('--scenes', type=int, default=40, help='scenes per synthetic screenplay')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--timeout', type=float, default=600, help='seconds a single page run may take')
+    parser.add_argument('--port', type=int, default=8599, help='port of the server started for every level')
+    parser.add_argument('--server-log', help='append the server output to this file')
+    parser.add_argument('--output', help='write every timed action to this CSV file')
+    args = parser.parse_args()
+
+    log = open(args.server_log, 'a') if args.server_log else subprocess.DEVNULL
+    summary, records = run_load_test(args.concurrency, args.sessions, args.scenes, args.seed, args.timeout, args.port, log)
+    with pd.option_context('display.width', 250, 'display.max_columns', None):
+        print(summary.to_string(index=False))
+    failed = records[records['error'].notna()]
+    if len(failed):
+        print(failed.groupby(['action', 'error']).size().to_string())
+    if args.output:
+        records.to_csv(args.output, index=False)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+import logging
+import os
+import re
+import threading
+import time
+import tracemalloc
+import weakref
+from contextlib import contextmanager
+import pandas as pd
+
+# Per-request memory accounting and upload admission limits. Both are configured through
+# environment variables so a deployment can tighten them without code changes.
+
+logger = logging.getLogger('reel_insights.memory')
+if not logger.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter('%(asctime)s %(name)s %(message)s'))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+
+
+def _env_int(name, default):
+    return int(os.environ.get(name, default))
+
+
+# tracemalloc slows down every allocation, so peak tracking is opt-in; without it the reports
+# label the peak column as off
+TRACK_MEMORY = os.environ.get('REEL_TRACK_MEMORY', '0') == '1'
+PEAK_OFF_COLUMN = 'peak_mb (off, set REEL_TRACK_MEMORY=1)'
+
+# trackers with a stage running right now, each maps to whether another stage overlapped it;
+# a tracker dropped in the middle of a stage leaves with its session
+_active_stages = weakref.WeakKeyDictionary()
+_active_lock = threading.Lock()
+
+ADMISSION_LIMITS = {
+    # rejected before any parsing
+    'max_bytes': _env_int('REEL_MAX_UPLOAD_BYTES', 5 * 1024 ** 2),
+    'max_lines': _env_int('REEL_MAX_LINES', 100000),
+    'max_characters': _env_int('REEL_MAX_CHARACTERS', 3000),
+    # admitted, but the dashboard skips its most memory hungry views
+    'downgrade_bytes': _env_int('REEL_DOWNGRADE_BYTES', 1024 ** 2),
+    'downgrade_characters': _env_int('REEL_DOWNGRADE_CHARACTERS', 300)
+}
+
+character_name_pattern = re.compile(r'\n\s*([A-Z][A-Z\s]+)\s*\n')
+
+
+class AdmissionError(Exception):
+    pass
+
+
+# Runs on the raw upload, before it is decoded
+def check_upload_size(size, limits=None):
+    limits = dict(ADMISSION_LIMITS, **(limits or {}))
+    if size > limits['max_bytes']:
+        raise AdmissionError(f"The file is {size / 1024 ** 2:.1f} MB, the limit is {limits['max_bytes'] / 1024 ** 2:.1f} MB.")
+
+# Cheap checks in increasing cost: size, line count, then distinct character cues
+def check_admission(data, text, limits=None):
+    limits = dict(ADMISSION_LIMITS, **(limits or {}))
+    check_upload_size(len(data), limits)
+    lines = text.count('\n') + 1
+    if lines > limits['max_lines']:
+        raise AdmissionError(f"The file has {lines} lines, the limit is {limits['max_lines']}.")
+    characters = len({name.strip() for name in character_name_pattern.findall(text)})
+    if characters > limits['max_characters']:
+        raise AdmissionError(f"The file has {characters} distinct character names, the limit is {limits['max_characters']}.")
+
+    reasons = []
+    if len(data) > limits['downgrade_bytes']:
+        reasons.append(f"large file ({len(data) / 1024 ** 2:.1f} MB)")
+    if characters > limits['downgrade_characters']:
+        reasons.append(f"{characters} distinct character names")
+    return {'bytes': len(data), 'lines': lines, 'characters': characters, 'downgraded': bool(reasons), 'reasons': reasons}
+
+
+class MemoryTracker:
+    # tracemalloc is process wide: with several sessions running at once a stage's peak includes
+    # the other sessions' allocations, and their reset_peak calls restart it. Such stages are
+    # marked as overlapped, their peak is only a rough figure
+
+    def __init__(self, request, enabled=None):
+        self.request = request
+        self.enabled = TRACK_MEMORY if enabled is None else enabled
+        self.stages = []
+        if self.enabled and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self._current = None
+
+    def start(self, name):
+        # starting a stage closes the previous one, which suits the linear page scripts
+        self.stop()
+        start_memory = 0
+        if self.enabled:
+            with _active_lock:
+                _active_stages[self] = False
+                if len(_active_stages) > 1:
+                    for tracker in _active_stages:
+                        _active_stages[tracker] = True
+            tracemalloc.reset_peak()
+            start_memory = tracemalloc.get_traced_memory()[0]
+        self._current = (name, time.perf_counter(), start_memory)
+
+    def stop(self):
+        if self._current is None:
+            return
+        name, start_time, start_memory = self._current
+        self._current = None
+        duration = time.perf_counter() - start_time
+        peak_mb = None
+        overlapped = False
+        if self.enabled:
+            peak_mb = (tracemalloc.get_traced_memory()[1] - start_memory) / 1024 ** 2
+            with _active_lock:
+                overlapped = _active_stages.pop(self, False)
+        self.stages.append({'stage': name, 'peak_mb': peak_mb, 'seconds': duration, 'overlapped': overlapped})
+        if peak_mb is None:
+            logger.info("%s %s: %.2fs (memory tracking off)", self.request, name, duration)
+        else:
+            logger.info("%s %s: peak %.1f MB%s, %.2fs", self.request, name, peak_mb,
+                        ' overlapped by other requests' if overlapped else '', duration)
+
+    @contextmanager
+    def stage(self, name):
+        self.start(name)
+        try:
+            yield
+        finally:
+            self.stop()
+
+    def report(self):
+        report = pd.DataFrame(self.stages, columns=['stage', 'peak_mb', 'seconds', 'overlapped'])
+        if not self.enabled:
+            return report.drop(columns='overlapped').rename(columns={'peak_mb': PEAK_OFF_COLUMN})
+        return report
@@ -2,11 +2,18 @@ import streamlit as st
 import re
 import pandas as pd
 import networkx as nx
-from charset_normalizer import from_bytes
 import matplotlib.pyplot as plt
-from pyvis.network import Network
-import tempfile
+import numpy as np
 import styles
+import caching
+import draft_analysis
+import ingestion
+import memory_guard
+import resources
+import screenplay_features
+import character_network
+import downsampling
+import sentiment_arc
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import nltk
@@ -52,8 +59,18 @@ def classify_and_save_scenes(text):
         })
     return scene_scores
 
-def plot_zoomable_trend_chart(data):
-    fig = px.line(data, x='Scene', y='Compound', title='Sentiment Changes Over Scenes')
+def plot_zoomable_trend_chart(data, scene_range=None, arc=None):
+    long_series = len(data) > downsampling.MAX_POINTS
+    rolling = arc['rolling'] if arc is not None else None
+    if long_series:
+        # long scripts: WebGL trace with a shape-preserving overview, full resolution only for the zoomed range
+        shown = downsampling.downsample_series(data['Scene'], data['Compound'], scene_range)
+        data = data.iloc[shown]
+        if rolling is not None:
+            rolling = rolling.iloc[shown]
+        fig = go.Figure(go.Scattergl(x=data['Scene'], y=data['Compound'], mode='lines'))
+    else:
+        fig = px.line(data, x='Scene', y='Compound', title='Sentiment Changes Over Scenes')
     fig.update_layout(
         title={
             'text': 'Sentiment Changes Over Scenes',
@@ -75,7 +92,7 @@ def plot_zoomable_trend_chart(data):
         margin=dict(l=20, r=20, t=40, b=20),
         hovermode='closest',
         xaxis=dict(
-            rangeslider=dict(visible=True),
+            rangeslider=dict(visible=not long_series),
             type="linear"
         ),
         plot_bgcolor='white',  # Set plot background to white
@@ -86,8 +103,205 @@ def plot_zoomable_trend_chart(data):
     fig.update_xaxes(tickfont=dict(color='black'))  
     fig.update_yaxes(tickfont=dict(color='black'))
 
+    # Arc structure on top of the raw scores: rolling mean, segment means, act boundaries and turning points
+    if arc is not None:
+        scatter = go.Scattergl if long_series else go.Scatter
+        fig.data[0].name = 'Scene sentiment'
+        fig.add_trace(scatter(x=rolling['Scene'], y=rolling['Rolling Mean'], mode='lines', name='Rolling mean',
+                              line=dict(color='#C8ACD6', width=3)))
+        # overlays stay inside the zoomed range so they do not widen the x axis again
+        low, high = scene_range if scene_range is not None else (data['Scene'].min(), data['Scene'].max())
+        segment_x, segment_y = [], []
+        for segment in arc['segments'].itertuples():
+            if segment.End >= low and segment.Start <= high:
+                segment_x += [max(segment.Start, low), min(segment.End, high), None]
+                segment_y += [segment.Mean, segment.Mean, None]
+        fig.add_trace(go.Scatter(x=segment_x, y=segment_y, mode='lines', name='Segment mean',
+                                 line=dict(color='#17153B', width=2, dash='dash')))
+        for act in arc['acts'].iloc[1:].itertuples():
+            if low <= act.Start <= high:
+                fig.add_vline(x=act.Start, line=dict(color='#2E236C', width=1, dash='dot'))
+        points = arc['turning_points']
+        points = points[points['Scene'].between(low, high)]
+        for kind, symbol, color in (('peak', 'triangle-up', '#6C946F'), ('trough', 'triangle-down', '#DC0083')):
+            selected = points[points['Kind'] == kind]
+            fig.add_trace(go.Scatter(x=selected['Scene'], y=selected['Compound'], mode='markers', name=kind.capitalize(),
+                                     marker=dict(color=color, symbol=symbol, size=14)))
+        fig.update_layout(showlegend=True)
+
+    return fig
+
+def plot_interactions_chart(data, scene_range=None):
+    fig = make_subplots(rows=1, cols=1)
+
+    if len(data) > downsampling.MAX_POINTS:
+        # long scripts: plot scene numbers with WebGL and keep only the points needed for the current zoom
+        scene_numbers = np.arange(1, len(data) + 1)
+        indices = downsampling.downsample_series(scene_numbers, data['Interaction Count'], scene_range)
+        fig.add_trace(
+            go.Scattergl(x=scene_numbers[indices], 
+                    y=data['Interaction Count'].iloc[indices], 
+                    mode='lines',
+                    name='Interactions',
+                    line=dict(color='#433D8B'),  
+                    hovertemplate='Scene: %{x}<br>Interactions: %{y}<extra></extra>')
+        )
+    else:
+        fig.add_trace(
+            go.Scatter(x=data['Scene'], 
+                    y=data['Interaction Count'], 
+                    mode='lines+markers',
+                    name='Interactions',
+                    line=dict(color='#433D8B'),  
+                    marker=dict(color='#433D8B'),  
+                    hovertemplate='Scene: %{x}<br>Interactions: %{y}<extra></extra>')
+        )
+
+    fig.update_layout(
+        title={
+        'text': 'Character Interactions Over Scenes',
+        'font': {'color': 'black'},  
+        'x': 0.5,  
+        'xanchor': 'center'
+        },
+        xaxis_title={
+        'text': 'Scene',
+        'font': {'color': 'black'}  
+        },
+        yaxis_title={
+        'text': 'Interaction Count',
+        'font': {'color': 'black'}  
+        },
+        hovermode='closest',
+        autosize=True,  
+        width=1745,
+        height=600,
+        plot_bgcolor='white',  
+        paper_bgcolor='white',  
+    )
+
+    fig.update_xaxes(tickangle=45, tickfont=dict(color='black'))  
+    fig.update_yaxes(tickfont=dict(color='black'))  
+
     return fig
 
+# scripts with many scenes are pooled into consecutive blocks so the heatmap stays small
+MAX_SIMILARITY_SCENES = 200
+
+# scripts whose last two drafts are kept for the draft comparison
+MAX_DRAFT_SCRIPTS = 5
+
+def plot_scene_similarity(scene_embeddings):
+    scene_numbers = np.arange(1, len(scene_embeddings) + 1)
+    if len(scene_embeddings) > MAX_SIMILARITY_SCENES:
+        starts = np.linspace(0, len(scene_embeddings), MAX_SIMILARITY_SCENES, endpoint=False).astype(int)
+        sizes = np.diff(np.append(starts, len(scene_embeddings)))
+        scene_embeddings = np.add.reduceat(scene_embeddings, starts, axis=0) / sizes[:, np.newaxis]
+        scene_numbers = starts + 1
+    similarity = screenplay_features.scene_similarity_matrix(scene_embeddings)
+
+    fig = go.Figure(go.Heatmap(
+        x=scene_numbers,
+        y=scene_numbers,
+        z=similarity,
+        colorscale=[[0, '#FFFFFF'], [0.5, '#C8ACD6'], [1, '#17153B']],
+        hovertemplate='Scene %{x} / Scene %{y}<br>Similarity: %{z:.2f}<extra></extra>'
+    ))
+    fig.update_layout(
+        title={
+            'text': 'Scene-to-Scene Similarity',
+            'font': {'color': 'black'},
+            'x': 0.5,
+            'xanchor': 'center'
+        },
+        xaxis_title={
+            'text': 'Scene',
+            'font': {'color': 'black'}
+        },
+        yaxis_title={
+            'text': 'Scene',
+            'font': {'color': 'black'}
+        },
+        width=1745,
+        height=800,
+        plot_bgcolor='white',
+        paper_bgcolor='white'
+    )
+    fig.update_xaxes(tickfont=dict(color='black'))
+    fig.update_yaxes(tickfont=dict(color='black'), autorange='reversed')
+    return fig
+
+# rendered charts are shared by all sessions through the bounded cache in caching.py
+@caching.cached('rendered_charts', max_entries=64, max_bytes=64 * 1024 ** 2, ttl=3600)
+def render_network_html(nodes, edges):
+    G = nx.Graph()
+    G.add_nodes_from(nodes)
+    for char1, char2, weight in edges:
+        G.add_edge(char1, char2, weight=weight)
+    # Precompute node positions so the browser does not have to stabilize the graph
+    positions = character_network.force_directed_layout(nodes, edges)
+    return character_network.build_network_html(G, positions)
+
+@caching.cached('rendered_charts')
+def render_trend_chart(data, scene_range):
+    # the arc statistics are O(n) in the scenes, recomputing them costs less than keeping them
+    return plot_zoomable_trend_chart(data, scene_range, sentiment_arc.analyze_arc(data))
+
+@caching.cached('rendered_charts')
+def render_interactions_chart(data, scene_range):
+    return plot_interactions_chart(data, scene_range)
+
+@caching.cached('rendered_charts')
+def render_scene_similarity(scene_embeddings):
+    return plot_scene_similarity(scene_embeddings)
+
+# Charts of an analysis, computed on this page or restored from a snapshot
+def show_dashboard_results(dashboard_results):
+    if dashboard_results['downgrade_reasons']:
+        st.warning(f"Some views were skipped to keep memory in check: {', '.join(dashboard_results['downgrade_reasons'])}.")
+
+    # Display the network graph
+    networks = dashboard_results['networks']
+    if networks:
+        st.markdown("<h2 style='text-align: center; color: white;'>Character Interaction Network</h1>", unsafe_allow_html=True)
+        network_mode = st.selectbox('Connect characters by', list(networks), key='network_mode')
+        network_nodes, network_edges = networks[network_mode]
+        st.components.v1.html(render_network_html(network_nodes, network_edges), height=800)
+        st.dataframe(dashboard_results['network_metrics'][network_mode], hide_index=True)
+
+    # Long series get a scene range slider, only the selected range is sent at full resolution
+    scene_interactions_df = dashboard_results['scene_interactions']
+    if not scene_interactions_df.empty:
+        interactions_chart = st.empty()
+        scene_range = None
+        if len(scene_interactions_df) > downsampling.MAX_POINTS:
+            scene_range = st.slider('Zoom to scenes', 1, len(scene_interactions_df), (1, len(scene_interactions_df)), key='interactions_range')
+        interactions_chart.plotly_chart(render_interactions_chart(scene_interactions_df, scene_range))
+
+    sentiment_data = dashboard_results['sentiment']
+    sentiment_chart = st.empty()
+    scene_range = None
+    if len(sentiment_data) > downsampling.MAX_POINTS:
+        scene_range = st.slider('Zoom to scenes', 0, len(sentiment_data) - 1, (0, len(sentiment_data) - 1), key='sentiment_range')
+    sentiment_chart.plotly_chart(render_trend_chart(sentiment_data, scene_range), use_container_width=True)
+
+    st.plotly_chart(render_scene_similarity(dashboard_results['scene_embeddings']))
+
+    # What changed between the last two drafts that were visualized
+    if len(dashboard_results['drafts']) == 2:
+        previous_draft, current_draft = dashboard_results['drafts']
+        st.markdown("<h2 style='text-align: center; color: white;'>What Changed Between Drafts</h2>", unsafe_allow_html=True)
+        st.write(f"{current_draft['recomputed']} of {len(current_draft['scenes'])} scenes were analysed again.")
+        st.dataframe(draft_analysis.summarize_drafts(previous_draft, current_draft), hide_index=True)
+        st.dataframe(draft_analysis.compare_drafts(previous_draft, current_draft), hide_index=True)
+
+    if dashboard_results['wordcloud'] is not None:
+        # Display the word cloud using Streamlit
+        st.image(dashboard_results['wordcloud'], use_column_width=1745)
+
+    with st.sidebar.expander('Diagnostics'):
+        st.dataframe(dashboard_results['memory_report'], hide_index=True)
+
 # Set Streamlit page configuration
 st.set_page_config(**styles.set_page_config())
 
@@ -124,6 +338,8 @@ st.markdown(
 st.markdown('<h1 class="big-title">R E E L - I N S I G H T S</h1>', unsafe_allow_html=True)
 st.markdown("<h1 style='text-align: center; color: white;'>Visualization Dashboard</h1>", unsafe_allow_html=True)
 
+_, vocabulary, embedding_matrix = resources.load_embeddings()
+
 # Check if a file has been uploaded
 if 'uploaded_file' in st.session_state and st.session_state['uploaded_file'] is not None:
     uploaded_file = st.session_state['uploaded_file']
@@ -132,12 +348,24 @@ if 'uploaded_file' in st.session_state and st.session_state['uploaded_file'] is
     # Add a button to create the visualization
     if st.button('Create Visualization'):
         
-        # Read the contents of the file
-        file_contents = uploaded_file.getvalue()
-        
-        # Use charset_normalizer to detect encoding
-        result = from_bytes(file_contents).best()
-        screenplay = str(result)
+        # Oversized uploads are rejected before they are decoded
+        tracker = memory_guard.MemoryTracker(uploaded_file.name)
+        file_bytes = uploaded_file.getvalue()
+        try:
+            memory_guard.check_upload_size(len(file_bytes))
+            tracker.start('ingestion')
+            # Read the contents of the file, UTF-8 first and encoding detection on a sample only if needed
+            screenplay_file = ingestion.read_screenplay(uploaded_file.name, file_bytes)
+            admission = memory_guard.check_admission(file_bytes, screenplay_file['text'])
+        except (ingestion.ScreenplayError, memory_guard.AdmissionError) as e:
+            tracker.stop()
+            st.error(f"This screenplay can't be visualized: {e}")
+            st.stop()
+        screenplay = screenplay_file['text']
+
+        # Admitted but heavy scripts skip the views whose cost grows with the cast or the text size
+        many_characters = admission['characters'] > memory_guard.ADMISSION_LIMITS['downgrade_characters']
+        large_file = admission['bytes'] > memory_guard.ADMISSION_LIMITS['downgrade_bytes']
 
         # List of common uppercase expressions to exclude
         non_character_expressions = [
@@ -147,10 +375,9 @@ if 'uploaded_file' in st.session_state and st.session_state['uploaded_file'] is
 
         # Regex pattern to capture character dialogues
         character_dialogue_pattern = re.compile(r'\n\s*([A-Z][A-Z\s]+)\s*\n\s*([^\n]+)')
-        dialogues = character_dialogue_pattern.findall(screenplay)
 
-        # Convert to DataFrame
-        dialogue_df = pd.DataFrame(dialogues, columns=['Character', 'Dialogue'])
+        # Dialogue lines from the element table, .fdx files give them directly without the regex
+        dialogue_df = ingestion.dialogue_frame(screenplay_file)
 
         # Identify character names
         character_name_pattern = re.compile(r'\n\s*([A-Z][A-Z\s]+)\s*\n')
@@ -177,125 +404,65 @@ if 'uploaded_file' in st.session_state and st.session_state['uploaded_file'] is
         # Filter dialogues to include only those with identified characters
         dialogue_df = dialogue_df[dialogue_df['Character'].isin(characters)]
 
-        # Create interaction matrix for all characters
-        all_characters = dialogue_df['Character'].unique()
-        interaction_matrix_all = pd.DataFrame(0, index=all_characters, columns=all_characters)
-
-        # Populate interaction matrix by considering adjacent dialogues
-        for i in range(len(dialogue_df) - 1):
-            char1 = dialogue_df.iloc[i]['Character']
-            char2 = dialogue_df.iloc[i + 1]['Character']
-            if char1 != char2:
-                interaction_matrix_all.loc[char1, char2] += 1
-                interaction_matrix_all.loc[char2, char1] += 1
-
-        # identify top 20 characters based on dialogue count
-        top_characters = dialogue_df['Character'].value_counts().head(20).index.tolist()
-
-        # create interaction matrix
-        interaction_matrix = pd.DataFrame(0, index=top_characters, columns=top_characters)
-
-        # populate interaction matrix by considering adjacent dialogues
-        for i in range(len(dialogue_df) - 1):
-            char1 = dialogue_df.iloc[i]['Character']
-            char2 = dialogue_df.iloc[i + 1]['Character']
-            if char1 in top_characters and char2 in top_characters and char1 != char2:
-                interaction_matrix.loc[char1, char2] += 1
-                interaction_matrix.loc[char2, char1] += 1
-
-        # create NetworkX graph
-        G = nx.Graph()
-
-        # add nodes
-        for character in top_characters:
-            G.add_node(character)
-
-        # add edges with weights
-        for char1 in top_characters:
-            for char2 in top_characters:
-                if interaction_matrix.loc[char1, char2] > 0:
-                    G.add_edge(char1, char2, weight=interaction_matrix.loc[char1, char2])
-
-        from pyvis.network import Network
-        import os
-
-        # Create a Pyvis network
-        net = Network(notebook=False, width="100%", height="800px", bgcolor="#FFFFFF", font_color="#FFFFFF")
-
-        # Add nodes to the network
-        for node in G.nodes():
-            net.add_node(node, label=node, title=node, shape="circle", size=30, 
-                        color={"background": "#2E236C", "border": "#C8ACD6"})
-
-        # Add edges to the network
-        for edge in G.edges(data=True):
-            weight = int(edge[2]['weight'])
-            net.add_edge(edge[0], edge[1], value=weight, title=f"Interactions: {weight}", 
-                        label=str(weight), color="#C8ACD6")
-
-        # Set options for visualization
-        net.set_options("""
-        var options = {
-        "nodes": {
-            "font": {
-            "size": 16,
-            "face": "Verdana",
-            "color": "2E236C"
-            },
-            "borderWidth": 2
-        },
-        "edges": {
-            "color": {
-            "inherit": false
-            },
-            "smooth": false,
-            "font": {
-            "size": 12,
-            "face": "Verdana",
-            "color": "#000000",
-            "strokeWidth": 2,
-            "strokeColor": "#FFFFFF"
-            },
-            "width": 2
-        },
-        "physics": {
-            "enabled": true,
-            "forceAtlas2Based": {
-            "gravitationalConstant": -30,
-            "centralGravity": 0.001,
-            "springLength": 200,
-            "springConstant": 0.001,
-            "damping": 0.5
-            },
-            "solver": "forceAtlas2Based",
-            "stabilization": {
-            "enabled": true,
-            "iterations": 1000,
-            "updateInterval": 25
-            },
-            "minVelocity": 0.5,
-            "maxVelocity": 20
-        },
-        "interaction": {
-            "dragNodes": true,
-            "dragView": true,
-            "zoomView": true
-        }
-        }
-        """)
+        tracker.start('character network')
+        # nodes and edges of the top characters per network mode, the metrics cover the whole cast
+        networks = {}
+        network_stats = {}
+        if not many_characters:
+            # Create interaction matrix for all characters
+            all_characters = dialogue_df['Character'].unique()
+            interaction_matrix_all = pd.DataFrame(0, index=all_characters, columns=all_characters)
+
+            # Populate interaction matrix by considering adjacent dialogues
+            for i in range(len(dialogue_df) - 1):
+                char1 = dialogue_df.iloc[i]['Character']
+                char2 = dialogue_df.iloc[i + 1]['Character']
+                if char1 != char2:
+                    interaction_matrix_all.loc[char1, char2] += 1
+                    interaction_matrix_all.loc[char2, char1] += 1
 
-        # Save the Pyvis network to a temporary file
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.html') as tmpfile:
-            net.save_graph(tmpfile.name)
-            
-        # Read the temporary file and display its contents
-        with open(tmpfile.name, 'r', encoding='utf-8') as f:
-            html_string = f.read()
+            # identify top 20 characters based on dialogue count
+            top_characters = dialogue_df['Character'].value_counts().head(20).index.tolist()
+
+            # create interaction matrix
+            interaction_matrix = pd.DataFrame(0, index=top_characters, columns=top_characters)
+
+            # populate interaction matrix by considering adjacent dialogues
+            for i in range(len(dialogue_df) - 1):
+                char1 = dialogue_df.iloc[i]['Character']
+                char2 = dialogue_df.iloc[i + 1]['Character']
+                if char1 in top_characters and char2 in top_characters and char1 != char2:
+                    interaction_matrix.loc[char1, char2] += 1
+                    interaction_matrix.loc[char2, char1] += 1
+
+            # create NetworkX graph
+            G = nx.Graph()
+
+            # add nodes
+            for character in top_characters:
+                G.add_node(character)
+
+            # add edges with weights
+            for char1 in top_characters:
+                for char2 in top_characters:
+                    if interaction_matrix.loc[char1, char2] > 0:
+                        G.add_edge(char1, char2, weight=interaction_matrix.loc[char1, char2])
+
+            # Generate the Pyvis html in memory
+            network_nodes = tuple(G.nodes())
+            network_edges = tuple((char1, char2, int(data['weight'])) for char1, char2, data in G.edges(data=True))
+            networks['Consecutive dialogue'] = (network_nodes, network_edges)
+            network_stats['Consecutive dialogue'] = character_network.network_metrics(interaction_matrix_all.to_numpy())
+
+        # Scene co-occurrence networks come from one sparse product and stay cheap for large casts
+        top_speakers = dialogue_df['Character'].value_counts().head(20).index.tolist()
+        for mode, weighting in character_network.NETWORK_MODES.items():
+            if weighting is None:
+                continue
+            cooccurrence, cast = character_network.cooccurrence_matrix(dialogue_df, weighting)
+            networks[mode] = (tuple(top_speakers), character_network.network_edges(cooccurrence, cast, set(top_speakers)))
+            network_stats[mode] = character_network.network_metrics(cooccurrence)
         
-        # Display the network graph
-        st.markdown("<h2 style='text-align: center; color: white;'>Character Interaction Network</h1>", unsafe_allow_html=True)
-        st.components.v1.html(html_string, height=800)
-
         # Store the screenplay text in session state for further use
         st.session_state['screenplay_text'] = screenplay
 
@@ -370,114 +537,103 @@ if 'uploaded_file' in st.session_state and st.session_state['uploaded_file'] is
             cleaned_text = "\n".join(cleaned_lines)
             return cleaned_text
 
+        tracker.start('scene interactions')
         screenplay_text = st.session_state['screenplay_text']
         title = uploaded_file.name.split('.')[0]
         scene_headings = identify_scenes(screenplay_text, title)
         scenes = extract_scenes(screenplay_text, scene_headings)
 
-        scene_dialogues = []
-        scene_counter = 1
-
+        # character offsets of every scene in the script, kept with the results
+        scene_spans = []
+        position = 0
         for scene_title, scene_content in scenes.items():
-            dialogues = character_dialogue_pattern.findall(scene_content)
-            for character, dialogue in dialogues:
-                scene_dialogues.append((f"Scene {scene_counter}", character.strip(), dialogue))
-            scene_counter += 1
+            start = screenplay_text.find(scene_content, position)
+            if start < 0:
+                start = screenplay_text.find(scene_content)
+            else:
+                position = start
+            scene_spans.append((scene_title, start, start + len(scene_content) if start >= 0 else -1))
+        scene_spans = pd.DataFrame(scene_spans, columns=['Scene', 'Start', 'End'])
 
-        dialogue_df = pd.DataFrame(scene_dialogues, columns=['Scene', 'Character', 'Dialogue'])
+        scene_interactions_df = pd.DataFrame(columns=['Scene', 'Interaction Count'])
+        if not many_characters:
+            scene_dialogues = []
+            scene_counter = 1
 
-        potential_characters = character_name_pattern.findall(screenplay_text)
+            for scene_title, scene_content in scenes.items():
+                dialogues = character_dialogue_pattern.findall(scene_content)
+                for character, dialogue in dialogues:
+                    scene_dialogues.append((f"Scene {scene_counter}", character.strip(), dialogue))
+                scene_counter += 1
 
-        cleaned_characters = [re.sub(r'\s+$', '', char) for char in potential_characters]
+            dialogue_df = pd.DataFrame(scene_dialogues, columns=['Scene', 'Character', 'Dialogue'])
 
-        cleaned_characters = [char for char in cleaned_characters if char not in non_character_expressions]
+            potential_characters = character_name_pattern.findall(screenplay_text)
 
-        character_counts = pd.Series(cleaned_characters).value_counts()
+            cleaned_characters = [re.sub(r'\s+$', '', char) for char in potential_characters]
 
-        characters = character_counts[character_counts > character_threshold].index.tolist()
+            cleaned_characters = [char for char in cleaned_characters if char not in non_character_expressions]
 
-        dialogue_df['Character'] = dialogue_df['Character'].apply(lambda x: re.sub(r'\s+$', '', x))
-
-        dialogue_df = dialogue_df[dialogue_df['Character'].isin(characters)]
+            character_counts = pd.Series(cleaned_characters).value_counts()
 
-        all_characters = dialogue_df['Character'].unique()
-        interaction_matrix_all = pd.DataFrame(0, index=all_characters, columns=all_characters)
+            characters = character_counts[character_counts > character_threshold].index.tolist()
 
-        scene_interactions = []
-
-        for scene, group in dialogue_df.groupby('Scene'):
-            scene_matrix = pd.DataFrame(0, index=all_characters, columns=all_characters)
-            for i in range(len(group) - 1):
-                char1 = group.iloc[i]['Character']
-                char2 = group.iloc[i + 1]['Character']
-                if char1 != char2:
-                    scene_matrix.loc[char1, char2] += 1
-                    scene_matrix.loc[char2, char1] += 1
-                    interaction_matrix_all.loc[char1, char2] += 1
-                    interaction_matrix_all.loc[char2, char1] += 1
-            scene_interactions.append((scene, scene_matrix.sum().sum()))
+            dialogue_df['Character'] = dialogue_df['Character'].apply(lambda x: re.sub(r'\s+$', '', x))
 
-        scene_interactions_df = pd.DataFrame(scene_interactions, columns=['Scene', 'Interaction Count'])
+            dialogue_df = dialogue_df[dialogue_df['Character'].isin(characters)]
 
-        scene_interactions_df['Interaction Count'] = scene_interactions_df['Interaction Count'] // 10
+            all_characters = dialogue_df['Character'].unique()
+            interaction_matrix_all = pd.DataFrame(0, index=all_characters, columns=all_characters)
 
-        scene_interactions_df['Scene'] = [f"Scene {i+1}" for i in range(len(scene_interactions_df))]
+            scene_interactions = []
 
-        fig = make_subplots(rows=1, cols=1)
+            for scene, group in dialogue_df.groupby('Scene'):
+                scene_matrix = pd.DataFrame(0, index=all_characters, columns=all_characters)
+                for i in range(len(group) - 1):
+                    char1 = group.iloc[i]['Character']
+                    char2 = group.iloc[i + 1]['Character']
+                    if char1 != char2:
+                        scene_matrix.loc[char1, char2] += 1
+                        scene_matrix.loc[char2, char1] += 1
+                        interaction_matrix_all.loc[char1, char2] += 1
+                        interaction_matrix_all.loc[char2, char1] += 1
+                scene_interactions.append((scene, scene_matrix.sum().sum()))
 
-        fig.add_trace(
-            go.Scatter(x=scene_interactions_df['Scene'], 
-                    y=scene_interactions_df['Interaction Count'], 
-                    mode='lines+markers',
-                    name='Interactions',
-                    line=dict(color='#433D8B'),  
-                    marker=dict(color='#433D8B'),  
-                    hovertemplate='Scene: %{x}<br>Interactions: %{y}<extra></extra>')
-        )
+            scene_interactions_df = pd.DataFrame(scene_interactions, columns=['Scene', 'Interaction Count'])
 
-        fig.update_layout(
-            title={
-            'text': 'Character Interactions Over Scenes',
-            'font': {'color': 'black'},  
-            'x': 0.5,  
-            'xanchor': 'center'
-            },
-            xaxis_title={
-            'text': 'Scene',
-            'font': {'color': 'black'}  
-            },
-            yaxis_title={
-            'text': 'Interaction Count',
-            'font': {'color': 'black'}  
-            },
-            hovermode='closest',
-            autosize=True,  
-            width=1745,
-            height=600,
-            plot_bgcolor='white',  
-            paper_bgcolor='white',  
-        )
+            scene_interactions_df['Interaction Count'] = scene_interactions_df['Interaction Count'] // 10
 
-        fig.update_xaxes(tickangle=45, tickfont=dict(color='black'))  
-        fig.update_yaxes(tickfont=dict(color='black'))  
+            scene_interactions_df['Scene'] = [f"Scene {i+1}" for i in range(len(scene_interactions_df))]
 
-        st.plotly_chart(fig)
 
+        tracker.start('sentiment')
         # Add the sentiment graph here
         scene_separated_text = "==================================================".join(scene_content for scene_title, scene_content in scenes.items())
-        processed_results = classify_and_save_scenes(scene_separated_text)
-        sentiment_data = pd.DataFrame(processed_results)
-        st.plotly_chart(plot_zoomable_trend_chart(sentiment_data), use_container_width=True)
+
+        # Only scenes that changed since the previous draft of the same script are scored again
+        draft_history = st.session_state.setdefault('drafts', {})
+        drafts = draft_history.pop(uploaded_file.name, [])
+        # the script visualized last moves to the end, the oldest scripts are dropped
+        draft_history[uploaded_file.name] = drafts
+        for file_name in list(draft_history)[:-MAX_DRAFT_SCRIPTS]:
+            del draft_history[file_name]
+        previous_draft = drafts[-1] if drafts else None
+        draft = draft_analysis.analyze_draft(scene_separated_text, previous_draft)
+        if previous_draft is None or draft['digest'] != previous_draft['digest']:
+            drafts.append(draft)
+            del drafts[:-2]
+        sentiment_data = pd.DataFrame(draft['scene_scores'])
+
+        tracker.start('scene embeddings')
+        # Per-scene GloVe embeddings, computed in one vectorized pass over the whole script
+        scene_embeddings = screenplay_features.get_scene_embeddings(list(scenes.values()), vocabulary, embedding_matrix)
 
         # Custom color function
         def custom_color_func(word, font_size, position, orientation, random_state=None, **kwargs):
             colors = ["#17153B", "#2E236C", "#433D8B", "#C8ACD6"]
             return colors[random_state.randint(0, len(colors) - 1)]
 
-        def create_word_cloud(file_contents):
-            # Use charset_normalizer to detect encoding
-            result = from_bytes(file_contents).best()
-            script_text = str(result)
+        def create_word_cloud(script_text):
 
             # Remove Directorial Expressions and Character Names
             directorial_expressions = [
@@ -506,7 +662,7 @@ if 'uploaded_file' in st.session_state and st.session_state['uploaded_file'] is
             filtered_words = [word for word in script_text.split() if word.lower() not in stopwords and len(word) >= 3]
             filtered_text = ' '.join(filtered_words)
 
-            nlp = spacy.load('en_core_web_sm')
+            nlp = resources.load_spacy()
             doc = nlp(filtered_text)
 
             names = set()
@@ -528,18 +684,41 @@ if 'uploaded_file' in st.session_state and st.session_state['uploaded_file'] is
 
             return wordcloud_text
 
-        file_contents = screenplay.encode(encoding="utf-8")
-        wordcloud_text = create_word_cloud(file_contents)
+        # spaCy runs over the whole text, large files go without the word cloud
+        tracker.start('word cloud')
+        wordcloud_text = create_word_cloud(screenplay) if not large_file else ''
 
+        image = None
         if wordcloud_text:
             # Create a high-resolution word cloud
             wordcloud = WordCloud(stopwords=STOPWORDS, background_color='white', color_func=custom_color_func, width=1745, height=800).generate(wordcloud_text)
 
             # Convert to image
             image = wordcloud.to_image()
+        tracker.stop()
+
+        # Keep the results so that zooming the charts does not recompute the analysis
+        st.session_state['dashboard_results'] = {
+            'file_name': uploaded_file.name,
+            'elements': ingestion.screenplay_elements(screenplay_file),
+            'scene_spans': scene_spans,
+            'networks': networks,
+            'network_metrics': network_stats,
+            'scene_interactions': scene_interactions_df,
+            'sentiment': sentiment_data,
+            'scene_embeddings': scene_embeddings,
+            'drafts': list(drafts),
+            'wordcloud': image,
+            'downgrade_reasons': admission['reasons'],
+            'memory_report': tracker.report()
+        }
 
-            # Display the word cloud using Streamlit
-            st.image(image, use_column_width=1745)
-
+    # results of this upload, or of the snapshot restored last on the Home page
+    dashboard_results = st.session_state.get('dashboard_results')
+    if dashboard_results is not None and (dashboard_results['file_name'] == uploaded_file.name
+                                          or dashboard_results['file_name'] in st.session_state.get('snapshot_names', ())):
+        show_dashboard_results(dashboard_results)
     else:
-        st.write("")
\ No newline at end of file
+        st.write("")
+elif st.session_state.get('dashboard_results') is not None and st.session_state['dashboard_results']['file_name'] in st.session_state.get('snapshot_names', ()):
+    show_dashboard_results(st.session_state['dashboard_results'])
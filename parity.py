@@ -0,0 +1,402 @@
+import argparse
+import os
+import pickle
+import sys
+import time
+import nltk
+nltk.download('stopwords')
+nltk.download('punkt')
+nltk.download('wordnet')
+nltk.download('omw-1.4')
+import numpy as np
+import pandas as pd
+import character_network
+import draft_analysis
+import feature_graph
+import feature_store
+import ingestion
+import screenplay_features
+import sensitivity
+import tree_ensemble
+
+# Golden output parity for the feature paths the trained models depend on. Every feature has a
+# reference engine (the implementation the models were trained with) and any number of
+# alternative engines; all of them run over the same screenplays, every output column is diffed
+# against the reference and the timings are reported next to the diffs.
+# Usage: python parity.py path/to/screenplays --golden data/parity_golden.parquet [--save-golden]
+
+DEFAULT_TOLERANCE = 1e-6
+GOLDEN_PATH = os.path.join('data', 'parity_golden.parquet')
+REFERENCE = 'reference'
+
+# feature -> {engine name: function(case, context)}, the functions return a dict of outputs
+ENGINES = {}
+
+
+def register(feature, engine, function):
+    ENGINES.setdefault(feature, {})[engine] = function
+
+
+# Small scripts that hit the branches a real corpus rarely reaches
+def synthetic_cases():
+    lines = ['', 'INT. KITCHEN - DAY', '', 'Rain against the window.', '']
+    for i in range(8):
+        lines += ['ANNA', f'Line number {i} of a monologue, nobody answers.', '']
+    one_character = '\n'.join(lines)
+
+    repeated = ['']
+    for i in range(6):
+        repeated += ['INT. KITCHEN - DAY', '', 'The kettle whistles.', '',
+                     'ANNA', 'Did you hear that?', '', 'BEN', f'Again, for the {i}th time.', '']
+    repeated_headings = '\n'.join(repeated)
+
+    no_dialogue = '\n'.join(['', 'EXT. DESERT - NIGHT', '', 'wind moves over the dunes.', '',
+                             'INT. TENT - NIGHT', '', 'a lamp flickers and goes out.', ''])
+
+    return {
+        'synthetic/no_dialogue': no_dialogue,
+        'synthetic/one_character': one_character,
+        'synthetic/repeated_headings': repeated_headings,
+        'synthetic/no_scene_headings': 'just a paragraph of prose without any screenplay layout.\n'
+    }
+
+
+def load_corpus(corpus_dir):
+    cases = {}
+    for path in feature_store.list_scripts(corpus_dir):
+        with open(path, 'rb') as f:
+            cases[os.path.relpath(path, corpus_dir)] = ingestion.read_screenplay(path, f.read())['text']
+    return cases
+
+
+# Shared inputs of a case, these are not timed
+def prepare_case(raw_text, context):
+    clean_text = screenplay_features.clean_script_text(raw_text)
+    case = {
+        'raw_text': raw_text,
+        'scene_separated_text': screenplay_features.process_screenplay(raw_text),
+        'clean_text': clean_text
+    }
+    if context.get('xgboost_models') is not None and context.get('embeddings_index') is not None:
+        # classifier inputs: the text features and a small metadata batch
+        case['text_features'] = screenplay_features.extract_text_features(raw_text, context['models'], context['embeddings_index'])
+        _, case['sweep_frame'] = sensitivity.build_sweep_frame(case['text_features']['script_features'], [1e6, 5e7, 2e8],
+                                                               [90, 120, 150], [('Drama',), ('Action', 'Comedy')], ['13', '18'])
+    return case
+
+
+def _cold_draft(case):
+    # the scene cache would turn every repeat after the first into a lookup
+    draft_analysis._scene_cache.clear()
+    return draft_analysis.analyze_draft(case['scene_separated_text'])
+
+
+def _screenplay_metrics(case, context):
+    return screenplay_features.calculate_screenplay_metrics(case['raw_text'])
+
+def _screenplay_metrics_sparse(case, context):
+    # same speaker filter as the reference, the network is a sparse matrix instead of networkx
+    text = case['raw_text']
+    counts = pd.Series(draft_analysis.character_name_pattern.findall(text)).value_counts()
+    characters = set(counts[counts > draft_analysis.character_threshold].index)
+    speakers = [character for character, _ in draft_analysis.character_dialogue_pattern.findall(text) if character in characters]
+    adjacency, _ = character_network.dialogue_adjacency(speakers)
+    return character_network.network_metrics(adjacency)
+
+def _scene_length_cv(case, context):
+    return {'scene_length_cv': screenplay_features.process_scene_lengths(case['scene_separated_text'])}
+
+def _scene_length_cv_draft(case, context):
+    return {'scene_length_cv': _cold_draft(case)['scene_length_cv']}
+
+SENTIMENT_COLUMNS = ['sentiment_score_average', 'sentiment_score_mean_squared_deviation', 'rel_sent_turns']
+
+def _sentiment(case, context):
+    scene_scores = screenplay_features.classify_and_save_scenes(case['scene_separated_text'])
+    outputs = dict(zip(SENTIMENT_COLUMNS, screenplay_features.statistic_sentiment(scene_scores)))
+    outputs['compound'] = [scores['Compound'] for scores in scene_scores]
+    return outputs
+
+def _sentiment_draft(case, context):
+    draft = _cold_draft(case)
+    outputs = dict(zip(SENTIMENT_COLUMNS, draft['sentiment']))
+    outputs['compound'] = [scores['Compound'] for scores in draft['scene_scores']]
+    return outputs
+
+def _text_cleaning(case, context):
+    return {'lemmatized_text': screenplay_features.lemmatized_script_text(case['clean_text'])}
+
+def _glove(case, context):
+    return {'glove': screenplay_features.get_script_embedding(case['clean_text'], context['embeddings_index'])}
+
+def _glove_segments(case, context):
+    return {'glove': screenplay_features.get_scene_embeddings([case['clean_text']], context['vocabulary'], context['matrix'])[0]}
+
+# Everything the classifiers see for a fixed set of metadata, plus the stacked prediction
+def _model_inputs(text_features, context, predict_success=screenplay_features.predict_success):
+    df = screenplay_features.build_feature_frame(text_features['script_features'], 50_000_000, ['Drama'], '13', 120)
+    outputs = df.iloc[0].to_dict()
+    outputs['lsa'] = text_features['lsa_text'][0]
+    outputs['glove'] = text_features['glove_text'][0]
+    outputs['success_probability'] = predict_success(text_features, df, context['models'])[0][1]
+    return outputs
+
+def _pipeline(case, context):
+    text_features = screenplay_features.extract_text_features(case['raw_text'], context['models'], context['embeddings_index'])
+    return _model_inputs(text_features, context)
+
+def _pipeline_draft(case, context):
+    # the Home page path: scene scores come from the incremental draft analysis
+    draft = _cold_draft(case)
+    text_features = screenplay_features.extract_text_features(case['raw_text'], context['models'], context['embeddings_index'],
+                                                              case['scene_separated_text'], draft['scene_scores'])
+    return _model_inputs(text_features, context)
+
+# Success probability of every classifier, for one script and for a batch of metadata rows
+def _classifier_outputs(case, models):
+    text_features = case['text_features']
+    outputs = {name: models[name].predict_proba(text_features[key])[:, 1]
+               for name, key in (('clf_tfidf', 'tfidf_text'), ('clf_lsa', 'lsa_text'), ('clf_glove', 'glove_text'))}
+    df = case['sweep_frame']
+    outputs['clf_combined'] = models['clf_combined'].predict_proba(screenplay_features.model_frame(df.iloc[:1], models))[:, 1]
+    outputs['clf_combined_batch'] = models['clf_combined'].predict_proba(screenplay_features.model_frame(df, models))[:, 1]
+    outputs['clf_stack'] = screenplay_features.predict_success(text_features, df.iloc[:1], models)[:, 1]
+    outputs['clf_stack_batch'] = screenplay_features.predict_success(text_features, df, models)[:, 1]
+    return outputs
+
+def _classifiers(case, context):
+    return _classifier_outputs(case, dict(context['models'], **context['xgboost_models']))
+
+def _classifiers_trees(case, context):
+    return _classifier_outputs(case, dict(context['models'], **context['tree_models']))
+
+def _pipeline_graph(case, context):
+    text_features = feature_graph.extract_text_features(case['raw_text'], context['models'], context['embeddings_index'])
+    return _model_inputs(text_features, context, feature_graph.predict_success)
+
+register('screenplay_metrics', REFERENCE, _screenplay_metrics)
+register('screenplay_metrics', 'sparse_network', _screenplay_metrics_sparse)
+register('scene_length_cv', REFERENCE, _scene_length_cv)
+register('scene_length_cv', 'draft_analysis', _scene_length_cv_draft)
+register('sentiment', REFERENCE, _sentiment)
+register('sentiment', 'draft_analysis', _sentiment_draft)
+register('text_cleaning', REFERENCE, _text_cleaning)
+register('glove', REFERENCE, _glove)
+register('glove', 'segment_reduce', _glove_segments)
+register('model_inputs', REFERENCE, _pipeline)
+register('model_inputs', 'draft_analysis', _pipeline_draft)
+register('model_inputs', 'feature_graph', _pipeline_graph)
+register('classifiers', REFERENCE, _classifiers)
+register('classifiers', 'tree_ensemble', _classifiers_trees)
+
+# GloVe vectors are float32, a different summation order alone moves the mean by a few 1e-6
+FEATURE_TOLERANCES = {
+    'glove': 1e-5
+}
+
+# features that cannot run without the pickled models or the GloVe vectors
+REQUIREMENTS = {
+    'glove': ['embeddings_index'],
+    'model_inputs': ['models', 'embeddings_index'],
+    'classifiers': ['xgboost_models', 'embeddings_index']
+}
+
+
+# One flat column per value: arrays become name_0, name_1, ..., text stays text
+def flatten(outputs):
+    if isinstance(outputs, pd.DataFrame):
+        outputs = outputs.iloc[0].to_dict()
+    flat = {}
+    for name, value in outputs.items():
+        if isinstance(value, str):
+            flat[name] = value
+        elif np.ndim(value) == 0:
+            flat[name] = float(value)
+        else:
+            for i, item in enumerate(np.ravel(value)):
+                flat[f'{name}_{i}'] = float(item)
+    return flat
+
+
+# Best of `repeat` runs; a raised exception is an output too and has to match as well
+def run_engine(function, case, context, repeat=1):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        try:
+            outputs = flatten(function(case, context))
+        except Exception as e:
+            outputs = {'error': type(e).__name__}
+        duration = time.perf_counter() - start
+        best = duration if best is None else min(best, duration)
+    return outputs, best
+
+
+def values_match(expected, actual, tolerance):
+    if isinstance(expected, str) or isinstance(actual, str):
+        return expected == actual
+    if np.isnan(expected) or np.isnan(actual):
+        return np.isnan(expected) and np.isnan(actual)
+    return abs(expected - actual) <= tolerance * max(1.0, abs(expected))
+
+
+def value_difference(expected, actual):
+    if isinstance(expected, str) or isinstance(actual, str) or expected is None or actual is None:
+        return np.nan if expected == actual else np.inf
+    if np.isnan(expected) and np.isnan(actual):
+        return 0.0
+    return abs(expected - actual)
+
+
+# Per column diff of one engine against the reference outputs of all cases
+def diff_outputs(reference, outputs, tolerance):
+    rows = {}
+    for case, expected in reference.items():
+        actual = outputs.get(case, {})
+        for column in expected.keys() | actual.keys():
+            row = rows.setdefault(column, {'column': column, 'max_abs_diff': 0.0, 'mismatched_cases': 0})
+            if column in expected and column in actual and values_match(expected[column], actual[column], tolerance):
+                difference = value_difference(expected[column], actual[column])
+            else:
+                row['mismatched_cases'] += 1
+                difference = value_difference(expected.get(column), actual.get(column))
+            if not np.isnan(difference):
+                row['max_abs_diff'] = max(row['max_abs_diff'], difference)
+    return pd.DataFrame(list(rows.values()), columns=['column', 'max_abs_diff', 'mismatched_cases'])
+
+
+def run_parity(cases, context, tolerance=DEFAULT_TOLERANCE, repeat=1, features=None, golden=None):
+    prepared = {name: prepare_case(raw_text, context) for name, raw_text in cases.items()}
+    summary = []
+    columns = []
+    reference_outputs = {}
+    for feature, engines in ENGINES.items():
+        if features and feature not in features:
+            continue
+        missing = [key for key in REQUIREMENTS.get(feature, []) if context.get(key) is None]
+        if missing:
+            print(f"Skipping {feature}: no {', '.join(missing)}")
+            continue
+
+        results = {}
+        for engine, function in engines.items():
+            outputs = {}
+            seconds = 0.0
+            for name, case in prepared.items():
+                outputs[name], duration = run_engine(function, case, context, repeat)
+                seconds += duration
+            results[engine] = (outputs, seconds)
+        reference, reference_seconds = results[REFERENCE]
+        reference_outputs[feature] = reference
+
+        comparisons = [(engine, outputs, seconds) for engine, (outputs, seconds) in results.items() if engine != REFERENCE]
+        if golden is not None and feature in golden:
+            # the stored outputs are the expectation, the current reference is the engine under test
+            comparisons.insert(0, ('reference vs golden', reference, reference_seconds))
+        feature_tolerance = max(tolerance, FEATURE_TOLERANCES.get(feature, 0.0))
+        for engine, outputs, seconds in comparisons:
+            expected = golden[feature] if engine == 'reference vs golden' else reference
+            diff = diff_outputs(expected, outputs, feature_tolerance)
+            diff.insert(0, 'engine', engine)
+            diff.insert(0, 'feature', feature)
+            columns.append(diff)
+            worst = diff.loc[diff['max_abs_diff'].idxmax(), 'column'] if not diff.empty else None
+            summary.append({
+                'feature': feature,
+                'engine': engine,
+                'columns': len(diff),
+                'mismatched_columns': int((diff['mismatched_cases'] > 0).sum()),
+                'max_abs_diff': diff['max_abs_diff'].max() if not diff.empty else 0.0,
+                'worst_column': worst,
+                'reference_s': reference_seconds,
+                'engine_s': seconds,
+                'speedup': reference_seconds / seconds if seconds else np.nan
+            })
+
+    summary = pd.DataFrame(summary, columns=['feature', 'engine', 'columns', 'mismatched_columns', 'max_abs_diff',
+                                             'worst_column', 'reference_s', 'engine_s', 'speedup'])
+    columns = pd.concat(columns, ignore_index=True) if columns else pd.DataFrame(
+        columns=['feature', 'engine', 'column', 'max_abs_diff', 'mismatched_cases'])
+    return summary, columns, reference_outputs
+
+
+# Golden outputs as a long table: one row per feature, case and column
+def save_golden(reference_outputs, path=GOLDEN_PATH):
+    rows = []
+    for feature, outputs in reference_outputs.items():
+        for case, flat in outputs.items():
+            for column, value in flat.items():
+                text = value if isinstance(value, str) else None
+                number = np.nan if isinstance(value, str) else value
+                rows.append((feature, case, column, number, text))
+    golden = pd.DataFrame(rows, columns=['feature', 'case', 'column', 'value', 'text'])
+    output_dir = os.path.dirname(path)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    golden.to_parquet(path, index=False)
+
+
+def load_golden(path=GOLDEN_PATH):
+    golden = {}
+    for feature, case, column, value, text in pd.read_parquet(path).itertuples(index=False):
+        golden.setdefault(feature, {}).setdefault(case, {})[column] = text if isinstance(text, str) else value
+    return golden
+
+
+def load_context(model_dir=None, glove_path=None):
+    context = {'models': None, 'xgboost_models': None, 'tree_models': None,
+               'embeddings_index': None, 'vocabulary': None, 'matrix': None}
+    if model_dir is not None:
+        context['models'] = screenplay_features.load_models(model_dir)
+        # the pickled XGBoost classifiers are the reference for the exported trees
+        context['xgboost_models'] = {}
+        context['tree_models'] = {}
+        for name in tree_ensemble.TREE_MODELS:
+            path = os.path.join(model_dir, screenplay_features.MODEL_FILES[name])
+            with open(path, 'rb') as f:
+                context['xgboost_models'][name] = pickle.load(f)
+            context['tree_models'][name] = (tree_ensemble.load_exported(model_dir, name, path)
+                                            or tree_ensemble.TreeEnsemble.from_xgboost(context['xgboost_models'][name]))
+    if glove_path is not None:
+        context['embeddings_index'] = screenplay_features.load_glove_embeddings(glove_path)
+        context['vocabulary'], context['matrix'] = screenplay_features.build_embedding_matrix(context['embeddings_index'])
+    return context
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Diff the optimized feature paths against the reference implementations.')
+    parser.add_argument('corpus_dir', nargs='?', default=None, help='directory with screenplay files')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='allowed difference, relative for values above 1')
+    parser.add_argument('--repeat', type=int, default=3, help='timing runs per engine and script, the best one counts')
+    parser.add_argument('--features', nargs='*', default=None, help=f"subset of: {', '.join(ENGINES)}")
+    parser.add_argument('--models', default=None, help='directory with the pickled models')
+    parser.add_argument('--glove', default=None, help='path to glove.6B.300d.txt')
+    parser.add_argument('--golden', default=None, help='parquet file with stored reference outputs')
+    parser.add_argument('--save-golden', action='store_true', help='write the reference outputs to --golden')
+    parser.add_argument('--no-synthetic', action='store_true', help='skip the synthetic edge cases')
+    args = parser.parse_args()
+
+    cases = {} if args.no_synthetic else synthetic_cases()
+    if args.corpus_dir:
+        cases.update(load_corpus(args.corpus_dir))
+    golden = None
+    if args.golden and not args.save_golden and os.path.exists(args.golden):
+        golden = load_golden(args.golden)
+
+    summary, columns, reference_outputs = run_parity(cases, load_context(args.models, args.glove), args.tolerance,
+                                                     args.repeat, args.features, golden)
+    if args.save_golden:
+        save_golden(reference_outputs, args.golden or GOLDEN_PATH)
+        print(f"Saved reference outputs of {len(cases)} scripts to {args.golden or GOLDEN_PATH}")
+
+    with pd.option_context('display.width', 200, 'display.max_columns', None):
+        print(summary.to_string(index=False))
+        failing = columns[columns['mismatched_cases'] > 0]
+        if not failing.empty:
+            print('\nColumns outside the tolerance:')
+            print(failing.to_string(index=False))
+    sys.exit(1 if (summary['mismatched_columns'] > 0).any() else 0)
+
+if __name__ == '__main__':
+    main()
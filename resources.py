@@ -0,0 +1,37 @@
+import os
+import spacy
+import streamlit as st
+import screenplay_features
+import similarity_index
+
+# Models and embeddings shared by all pages, st.cache_resource keeps one copy per process
+
+# cache all models! This led to the long load timmes
+@st.cache_resource
+def load_models():
+    return screenplay_features.load_models()
+
+@st.cache_resource
+def download_glove_embeddings():
+    return screenplay_features.download_glove_embeddings()
+
+# GloVe as a word -> vector dict plus the vocabulary/matrix form used for vectorized lookups,
+# the dict values are views into the matrix so the vectors are held only once
+@st.cache_resource
+def load_embeddings():
+    embeddings_index = screenplay_features.load_glove_embeddings(download_glove_embeddings())
+    vocabulary, matrix = screenplay_features.build_embedding_matrix(embeddings_index)
+    embeddings_index = {word: matrix[i] for word, i in vocabulary.items()}
+    return embeddings_index, vocabulary, matrix
+
+# one spaCy pipeline per process instead of loading it for every word cloud
+@st.cache_resource
+def load_spacy():
+    return spacy.load('en_core_web_sm')
+
+# Reference library for comparable films, None until similarity_index.py has been run
+@st.cache_resource
+def load_similarity_index():
+    if not os.path.exists(similarity_index.INDEX_PATH):
+        return None
+    return similarity_index.SimilarityIndex.load(similarity_index.INDEX_PATH)
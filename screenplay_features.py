@@ -0,0 +1,482 @@
+import os
+import pickle
+import re
+import string
+import threading
+import requests
+import numpy as np
+import pandas as pd
+import networkx as nx
+import textstat
+from nltk.tokenize import word_tokenize
+from nltk.corpus import stopwords
+from nltk.stem import WordNetLemmatizer
+from textblob import TextBlob
+from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+import tree_ensemble
+
+# Feature extraction shared by Home.py and the offline tools. Nothing in here depends on
+# Streamlit, the pages wrap these functions with their own caching.
+
+lemmatizer = WordNetLemmatizer()
+stop_words = set(stopwords.words('english'))
+
+# WordNet and punkt load lazily on first use, which is not thread safe
+_nltk_lock = threading.Lock()
+_nltk_loaded = False
+
+def ensure_nltk_loaded():
+    global _nltk_loaded
+    if _nltk_loaded:
+        return
+    with _nltk_lock:
+        if not _nltk_loaded:
+            for token in word_tokenize('the writers were warming up their screenplays'):
+                lemmatizer.lemmatize(token)
+            _nltk_loaded = True
+
+# generate list of genres and ages to choose from 
+genre_list = ['Action', 'Adventure', 'Animation', 'Biography', 'Comedy', 'Crime', 'Drama', 'Family', 'Fantasy', 'Film-Noir', 'History', 'Horror', 'Music', 'Musical', 'Mystery', 'Romance', 'Sci-Fi', 'Sport', 'Thriller', 'War', 'Western']
+genre_columns = [f'genre_{genre.lower()}' for genre in genre_list]
+age_list = ['0', '6', '13', '17', '18']
+age_columns = ['age_0', 'age_6', 'age_13', 'age_17', 'age_18']
+
+# column scaler from model
+columns_to_scale = ['runtime_minutes', 'production_budget','average_degree_centrality',
+'average_closeness_centrality', 'average_betweenness_centrality',
+'average_interaction_diversity', 'normalized_interaction_coefficient',
+'scene_length_cv']
+
+# pickled models, loaded by name from the models directory
+MODEL_FILES = {
+    'tfidf': 'tfidf_vectorizer.pkl',
+    'lsa': 'lsa.pkl',
+    'lda': 'lda.pkl',
+    'counts': 'counts.pkl',
+    'clf_tfidf': 'clf_tfidf.pkl',
+    'clf_glove': 'clf_glove.pkl',
+    'clf_lsa': 'clf_lsa.pkl',
+    'clf_combined': 'clf_combined.pkl',
+    'clf_stack': 'clf_stack.pkl',
+    'scaler': 'scaler.pkl'
+}
+
+# Identify scene titles
+def identify_scenes(text):
+    ext_pattern = re.compile(r'\bEXT[.\:\s\-\–]', re.MULTILINE)
+    int_pattern = re.compile(r'INT[.\:\s\-\–]', re.MULTILINE)
+    uppercase_pattern = re.compile(r'^[A-Z0-9\s:\(\)\-\.\:]+$', re.MULTILINE)
+    fade_pattern = re.compile(r'\bFADE OUT[.\:\s\-\–]', re.MULTILINE)
+    cut_pattern = re.compile(r'\bCUT TO[.\:\s\-\–]', re.MULTILINE)
+    dissolve_pattern = re.compile(r'\bDISSOLVE[.\:\s\-\–]', re.MULTILINE)
+    smash_pattern = re.compile(r'\bSMASH CUT[.\:\s\-\–]', re.MULTILINE)
+    scene_pattern = re.compile(r'(?m)^\[Scene:?\s.*?\]$', re.MULTILINE)
+    
+    lines = text.splitlines()
+    lines = [line.lstrip() for line in lines]
+    
+    matches = []
+    match_counter = 1
+    for line in lines:
+        if ext_pattern.search(line) or int_pattern.search(line):
+            matches.append(f"{line} SCENE{match_counter:03d}")
+            match_counter += 1
+    
+    if len(matches) < 150:
+        for line in lines:
+            if uppercase_pattern.match(line) and line not in matches:
+                words = line.split()
+                if len(words) >= 3:
+                    matches.append(f"{line} SCENE{match_counter:03d}")
+                    match_counter += 1
+    
+    if len(matches) < 150:
+        for line in lines:
+            if (fade_pattern.search(line) or cut_pattern.search(line) or
+                dissolve_pattern.search(line) or smash_pattern.search(line) or scene_pattern.search(line)) and line not in matches:
+                matches.append(f"{line} SCENE{match_counter:03d}")
+                match_counter += 1
+    
+    return matches
+
+def get_scene_separated_text(scenes):
+    scene_separated_text = f"Scene count: {len(scenes)}\n\n"
+    
+    for i, (scene_title, scene_content) in enumerate(scenes.items(), start=1):
+        cleaned_scene_content = clean_scene_text(scene_content)
+        scene_separated_text += "=" * 50 + "\n"
+        scene_separated_text += f"{cleaned_scene_content}\n\n"
+    
+    return scene_separated_text
+
+def calculate_screenplay_metrics(screenplay):
+    try:
+            
+        # regex pattern to capture character dialogues
+        character_dialogue_pattern = re.compile(r'\n\s*([A-Z][A-Z\s]+)\s*\n\s*([^\n]+)')
+        dialogues = character_dialogue_pattern.findall(screenplay)
+
+        # convert to df
+        dialogue_df = pd.DataFrame(dialogues, columns=['Character', 'Dialogue'])
+
+        # filter out non-character entries from dialogues
+        character_name_pattern = re.compile(r'\n\s*([A-Z][A-Z\s]+)\s*\n')
+        potential_characters = character_name_pattern.findall(screenplay)
+        character_counts = pd.Series(potential_characters).value_counts()
+        character_threshold = 5  # number of times a character has to be mentioned
+        characters = character_counts[character_counts > character_threshold].index.tolist()
+        dialogue_df = dialogue_df[dialogue_df['Character'].isin(characters)]
+
+        # create interaction matrix for all characters
+        all_characters = dialogue_df['Character'].unique()
+        interaction_matrix_all = pd.DataFrame(0, index=all_characters, columns=all_characters)
+
+        # populate interaction matrix by considering adjacent dialogues
+        for i in range(len(dialogue_df) - 1):
+            char1 = dialogue_df.iloc[i]['Character']
+            char2 = dialogue_df.iloc[i + 1]['Character']
+            if char1 != char2:
+                interaction_matrix_all.loc[char1, char2] += 1
+                interaction_matrix_all.loc[char2, char1] += 1
+
+        # create networkx graph from interaction matrix
+        G_all = nx.from_pandas_adjacency(interaction_matrix_all)
+
+        # calculate degree centrality (value for how central a character is)
+        degree_centrality = nx.degree_centrality(G_all)
+        average_degree_centrality = sum(degree_centrality.values()) / len(degree_centrality)
+
+        # calculate closeness centrality (value for how close characters are)
+        closeness_centrality = nx.closeness_centrality(G_all)
+        average_closeness_centrality = sum(closeness_centrality.values()) / len(closeness_centrality)
+
+        # calculate betweenness centrality (not sure about this one)
+        betweenness_centrality = nx.betweenness_centrality(G_all)
+        average_betweenness_centrality = sum(betweenness_centrality.values()) / len(betweenness_centrality)
+
+        # interaction diversity (number of unique characters each character interacts with)
+        interaction_diversity = (interaction_matrix_all > 0).sum(axis=1)
+        average_interaction_diversity = interaction_diversity.mean()
+
+        # normalized interaction coefficient (by total number of interactions)
+        total_interactions = interaction_matrix_all.sum().sum()
+        normalized_interaction_coefficient = total_interactions / (len(all_characters) * (len(all_characters) - 1))
+
+        # create df to store coefficients
+        screenplay_metrics = pd.DataFrame([{
+            'average_degree_centrality': average_degree_centrality,
+            'average_closeness_centrality': average_closeness_centrality,
+            'average_betweenness_centrality': average_betweenness_centrality,
+            'average_interaction_diversity': average_interaction_diversity,
+            'normalized_interaction_coefficient': normalized_interaction_coefficient
+        }])
+
+    except ZeroDivisionError:
+        print("ZeroDivisionError: no recurring characters found")
+        screenplay_metrics = pd.DataFrame([{
+            'average_degree_centrality': 0,
+            'average_closeness_centrality': 0,
+            'average_betweenness_centrality': 0,
+            'average_interaction_diversity': 0,
+            'normalized_interaction_coefficient': 0
+        }])
+    
+    return screenplay_metrics
+
+# Clean text
+def clean_scene_text(scene_text):
+    lines = scene_text.splitlines()
+    cleaned_lines = [re.sub(r'\s+', ' ', line.strip()) for line in lines]
+    cleaned_text = "\n".join(cleaned_lines)
+    return cleaned_text
+
+# Extract Scene
+def extract_scenes(text, matches):
+    scenes = {}
+
+    for i in range(len(matches)):
+        scene_title = matches[i]
+        numbered_scene_title = scene_title.split(' SCENE')[0]
+        scene_id = scene_title.split(' SCENE')[1]
+        start_pos = text.find(numbered_scene_title)
+
+        if i + 1 < len(matches):
+            next_scene_title = matches[i + 1].split(' SCENE')[0]
+            end_pos = text.find(next_scene_title, start_pos + len(numbered_scene_title))
+        else:
+            end_pos = len(text)
+
+        scene_text = text[start_pos:end_pos].strip()
+        unique_scene_title = f"{scene_id} {numbered_scene_title}"
+        scenes[unique_scene_title] = scene_text
+
+    return scenes
+
+def extract_scene_lengths(scene_separated_text):
+    scenes = scene_separated_text.split('=' * 50)
+    scene_lengths = [len(scene.strip().split()) for scene in scenes if scene.strip()]
+    return scene_lengths
+
+# function to get mean length of scenes and standard deviation from mean
+def analyze_scene_lengths(scene_lengths):
+    mean_length = np.mean(scene_lengths)
+    std_length = np.std(scene_lengths)
+    return mean_length, std_length
+
+# function to calculate coefficient of variation
+def coherence_classifier(mean_length, std_length):
+    coefficient_of_variation = std_length / mean_length
+    return coefficient_of_variation
+
+# function to process all screenplays
+def process_scene_lengths(scene_separated_text):
+    # extract scene lengths
+    scene_lengths = extract_scene_lengths(scene_separated_text)
+    
+    if scene_lengths:
+        # analyze scene lengths
+        mean_length, std_length = analyze_scene_lengths(scene_lengths)
+        coefficient_of_variation = coherence_classifier(mean_length, std_length)
+    
+    return coefficient_of_variation
+
+# Scene Sentiment summaries
+def classify_and_save_scenes(text):
+    # Open file 
+    scenes = text.split("==================================================")
+    analyzer = SentimentIntensityAnalyzer()
+    scene_scores = []
+    for i, scene in enumerate(scenes):
+        preprocessed_text = preprocess_text(scene)
+        scores = analyzer.polarity_scores(preprocessed_text)
+        scene_scores.append({
+            "Scene": i,
+            "Negative": scores['neg'],
+            "Neutral": scores['neu'],
+            "Positive": scores['pos'],
+            "Compound": scores['compound']
+        })
+    return scene_scores
+
+def preprocess_text(text):
+    # Remove all lines that include EXT or INT
+    lines = text.split('\n')
+    cleaned_lines = [line for line in lines if not line.strip().startswith(('EXT', 'INT'))]
+    cleaned_text = '\n'.join(cleaned_lines)
+    cleaned_text = re.sub(r'[^\w\s]', '', cleaned_text.lower())
+    tokens = word_tokenize(cleaned_text)
+    tokens = [token for token in tokens if token not in stop_words]
+    tokens = [lemmatizer.lemmatize(token) for token in tokens]
+    processed_text = ' '.join(tokens)
+    return processed_text
+
+def statistic_sentiment(scene_scores):
+    df_1 = pd.DataFrame(scene_scores)
+    average = df_1['Compound'].mean()
+    mean_squared_deviation = ((df_1['Compound'] - average) ** 2).mean()
+    compound_values = df_1['Compound'].values
+    sign_changes = np.sign(compound_values[:-1]) * np.sign(compound_values[1:])
+    num_turns = int(np.sum(sign_changes == -1))
+    scenes_count = len(df_1['Compound'])
+    rel_sent_turns = num_turns/scenes_count
+    return average, mean_squared_deviation, rel_sent_turns
+
+# Cleanup and lemmatization
+def remove_punctuation(text):
+    return text.translate(str.maketrans('', '', string.punctuation))
+
+def remove_stopwords(text):
+    words = word_tokenize(text)
+    words = [word for word in words if word.lower() not in stop_words]
+    return ' '.join(words)
+
+def lemmatize_text(text):
+    words = word_tokenize(text)
+    words = [lemmatizer.lemmatize(word) for word in words]
+    return ' '.join(words)
+
+# the literal replace below never matched whitespace, the trained models saw the text as is
+def clean_script_text(raw_text):
+    return raw_text.replace(r'\s+', ' ').strip().lower()
+
+# tfidf input: punctuation, stopwords and inflections removed
+def lemmatized_script_text(clean_text):
+    return lemmatize_text(remove_stopwords(remove_punctuation(clean_text)))
+
+def sentiment_features(text):
+    blob = TextBlob(text)
+    return pd.Series({'polarity': blob.sentiment.polarity, 'subjectivity': blob.sentiment.subjectivity})
+
+def load_glove_embeddings(file_path):
+    embeddings_index = {}
+    with open(file_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            values = line.split()
+            word = values[0]
+            coefs = values[1:]
+            
+            # Check if the number of coefficients matches the expected dimension (300)
+            if len(coefs) != 300:
+                print(f"Skipping line with unexpected number of values: {line}")
+                continue
+            
+            embeddings_index[word] = np.asarray(coefs, dtype='float32')
+    return embeddings_index
+
+def download_glove_embeddings(glove_dir='data'):
+    glove_file = 'glove.6B.300d.txt'
+    glove_path = os.path.join(glove_dir, glove_file)
+
+    # Create the directory if it doesn't exist
+    if not os.path.exists(glove_dir):
+        os.makedirs(glove_dir)
+
+    if not os.path.exists(glove_path):
+        print(f"Downloading GloVe embeddings to {glove_dir}...")
+        url = "https://drive.google.com/uc?export=download&id=1d4Q7O59wzAfGkM0M_nC_cFX5KlTYxHde"
+        
+        # Download the .txt file directly
+        response = requests.get(url, stream=True)
+        with open(glove_path, 'wb') as f:
+            for chunk in response.iter_content(chunk_size=128):
+                f.write(chunk)
+
+    return glove_path
+
+def get_script_embedding(script, embeddings_index, embedding_dim=300):
+    words = script.split()
+    valid_embeddings = [embeddings_index[word] for word in words if word in embeddings_index]
+    if not valid_embeddings:
+        return np.zeros(embedding_dim)
+    return np.mean(valid_embeddings, axis=0)
+
+# Vocabulary (word -> row id) and stacked vectors of a GloVe index
+def build_embedding_matrix(embeddings_index, embedding_dim=300):
+    vocabulary = {word: i for i, word in enumerate(embeddings_index)}
+    if not embeddings_index:
+        return vocabulary, np.zeros((0, embedding_dim), dtype='float32')
+    return vocabulary, np.vstack(list(embeddings_index.values()))
+
+# Mean GloVe vector per scene in one pass: the whole token stream is mapped to row ids once
+# and the vectors are summed per scene with np.add.reduceat, scenes without known words stay zero
+def get_scene_embeddings(scenes, vocabulary, matrix):
+    scene_tokens = [scene.lower().split() for scene in scenes]
+    token_counts = np.fromiter((len(tokens) for tokens in scene_tokens), dtype=np.int64, count=len(scene_tokens))
+    token_ids = np.fromiter((vocabulary.get(token, -1) for tokens in scene_tokens for token in tokens),
+                            dtype=np.int64, count=int(token_counts.sum()))
+    token_scene = np.repeat(np.arange(len(scene_tokens)), token_counts)
+
+    known = token_ids >= 0
+    token_ids = token_ids[known]
+    token_scene = token_scene[known]
+    known_counts = np.bincount(token_scene, minlength=len(scene_tokens))
+
+    embeddings = np.zeros((len(scene_tokens), matrix.shape[1]), dtype=matrix.dtype)
+    non_empty = known_counts > 0
+    if non_empty.any():
+        starts = np.concatenate(([0], np.cumsum(known_counts)[:-1]))[non_empty]
+        embeddings[non_empty] = np.add.reduceat(matrix[token_ids], starts, axis=0) / known_counts[non_empty, np.newaxis]
+    return embeddings
+
+# Cosine similarity between all pairs of scene embeddings
+def scene_similarity_matrix(embeddings):
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    normalized = np.divide(embeddings, norms, out=np.zeros_like(embeddings), where=norms > 0)
+    return normalized @ normalized.T
+
+# classifiers with an up to date tree export are served from the flat arrays, without xgboost
+def load_models(model_dir='models'):
+    models = {}
+    for name, file_name in MODEL_FILES.items():
+        path = os.path.join(model_dir, file_name)
+        if name in tree_ensemble.TREE_MODELS:
+            models[name] = tree_ensemble.load_exported(model_dir, name, path)
+            if models[name] is not None:
+                continue
+        with open(path, 'rb') as f:
+            models[name] = pickle.load(f)
+    return models
+
+def process_screenplay(text):
+    scene_headings = identify_scenes(text)
+    scenes = extract_scenes(text, scene_headings)
+    scene_separated_text = get_scene_separated_text(scenes)
+    return scene_separated_text
+
+# All features that only depend on the screenplay text, computed once per script
+def extract_text_features(raw_text, models, embeddings_index, scene_separated_text=None, scene_scores=None):
+    if scene_separated_text is None:
+        scene_separated_text = process_screenplay(raw_text)
+    df_screenplay_metrics = calculate_screenplay_metrics(raw_text)
+    # scene scores of an earlier draft analysis can be passed in to skip VADER
+    processed_results = scene_scores if scene_scores is not None else classify_and_save_scenes(scene_separated_text)
+    clean_text = clean_script_text(raw_text)
+    lem_text = lemmatized_script_text(clean_text)
+
+    #tfidf and lsa
+    tfidf_text = models['tfidf'].transform([lem_text])
+    lsa_text = models['lsa'].transform(tfidf_text)
+    #lda
+    count_text = models['counts'].transform([clean_text])
+    lda_text = models['lda'].transform(count_text)
+    lda_columns = [f'topic_{i}' for i in range(lda_text.shape[1])]
+    df_lda = pd.DataFrame(lda_text, columns=lda_columns)
+
+    #glove embedding
+    df_clean = pd.DataFrame({'clean':[clean_text]})
+    glove_text = np.vstack(df_clean['clean'].apply(lambda x: get_script_embedding(x, embeddings_index)).values)
+
+    df = pd.DataFrame({'scene_length_cv': [process_scene_lengths(scene_separated_text)]})
+    # Scene Sentiment summaries
+    df[['sentiment_score_average', 'sentiment_score_mean_squared_deviation', 'rel_sent_turns',]] = statistic_sentiment(processed_results)
+    # reading ease
+    df['flesch_reading_ease'] = textstat.flesch_reading_ease(clean_text)
+    df['flesch_kincaid_grade'] = textstat.flesch_kincaid_grade(clean_text)
+    df[['polarity', 'subjectivity']] = sentiment_features(clean_text)
+    df = pd.concat([df, df_lda, df_screenplay_metrics], axis=1)
+
+    return {
+        'scene_separated_text': scene_separated_text,
+        'scene_scores': processed_results,
+        'clean_text': clean_text,
+        'tfidf_text': tfidf_text,
+        'lsa_text': lsa_text,
+        'lda_text': lda_text,
+        'glove_text': glove_text,
+        'script_features': df
+    }
+
+# Model input frame: user metadata next to the script features
+def build_feature_frame(script_features, production_budget, genres, age_rating, run_time):
+    df_genre = pd.DataFrame([[genre in genres for genre in genre_list]], columns=genre_columns, dtype=int)
+    df_age = pd.DataFrame([[age in age_rating for age in age_list]], columns=age_columns, dtype=int)
+    df_age.drop('age_0',axis=1, inplace=True)
+    df = pd.concat([df_age, df_genre], axis=1)
+    df['production_budget'] = production_budget
+    df['runtime_minutes'] = run_time
+    df = pd.concat([df, script_features.reset_index(drop=True)], axis=1)
+    return df
+
+# Scaled columns in the order clf_combined was trained with
+def model_frame(df, models):
+    #scaling columns
+    df = df.copy()
+    df[columns_to_scale] = models['scaler'].transform(df[columns_to_scale])
+    #order columns
+    cols_when_model_builds = tree_ensemble.model_feature_names(models['clf_combined'])
+    return df[cols_when_model_builds]
+
+# Stacked ensemble prediction, returns one [failure, success] row per row of df. The text
+# models only see the script, so their single prediction is shared by every metadata row.
+def predict_success(text_features, df, models):
+    df = model_frame(df, models)
+
+    # separate pred of probabilities and ensemble
+    y_pred_tfidf = models['clf_tfidf'].predict_proba(text_features['tfidf_text'])
+    y_pred_lsa = models['clf_lsa'].predict_proba(text_features['lsa_text'])
+    y_pred_glove = models['clf_glove'].predict_proba(text_features['glove_text'])
+    y_pred_combined = models['clf_combined'].predict_proba(df)
+    if len(df) > 1:
+        y_pred_tfidf, y_pred_lsa, y_pred_glove = [np.repeat(y_pred, len(df), axis=0) for y_pred in (y_pred_tfidf, y_pred_lsa, y_pred_glove)]
+    X_stack = np.column_stack((y_pred_tfidf, y_pred_lsa, y_pred_glove, y_pred_combined))
+    return models['clf_stack'].predict_proba(X_stack)
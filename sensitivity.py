@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+from screenplay_features import genre_list, genre_columns, age_list, age_columns, predict_success
+
+# What-if sweep: the script's text features are computed once and every combination of
+# budget, runtime, genres and age rating is scored in a single batch.
+
+def genre_label(genres):
+    return ' / '.join(genres) if genres else 'No genre'
+
+# Metadata grid next to the broadcast script features, in the layout build_feature_frame produces
+def build_sweep_frame(script_features, budgets, run_times, genre_options, age_options):
+    grid = pd.MultiIndex.from_product(
+        [budgets, run_times, range(len(genre_options)), age_options],
+        names=['production_budget', 'runtime_minutes', 'genre_option', 'age_rating']
+    ).to_frame(index=False)
+
+    # same encoding as the single prediction: one row per option, picked per grid cell
+    genre_matrix = np.array([[genre in genres for genre in genre_list] for genres in genre_options], dtype=int)
+    age_matrix = np.array([[age in age_rating for age in age_list] for age_rating in age_options], dtype=int)
+    age_index = pd.Index(age_options).get_indexer(grid['age_rating'])
+
+    df_age = pd.DataFrame(age_matrix[age_index], columns=age_columns).drop('age_0', axis=1)
+    df_genre = pd.DataFrame(genre_matrix[grid['genre_option'].to_numpy()], columns=genre_columns)
+    df = pd.concat([df_age, df_genre], axis=1)
+    df['production_budget'] = grid['production_budget'].to_numpy()
+    df['runtime_minutes'] = grid['runtime_minutes'].to_numpy()
+    df_script = pd.DataFrame(np.repeat(script_features.to_numpy(), len(grid), axis=0), columns=script_features.columns)
+    df = pd.concat([df, df_script], axis=1)
+
+    grid['genres'] = [genre_label(genre_options[i]) for i in grid['genre_option']]
+    return grid, df
+
+def run_sweep(text_features, models, budgets, run_times, genre_options, age_options):
+    grid, df = build_sweep_frame(text_features['script_features'], budgets, run_times, genre_options, age_options)
+    grid['success_probability'] = predict_success(text_features, df, models)[:, 1]
+    return grid
+
+def plot_sweep_heatmap(sweep, genres, age_rating):
+    selection = sweep[(sweep['genres'] == genres) & (sweep['age_rating'] == age_rating)]
+    surface = selection.pivot(index='runtime_minutes', columns='production_budget', values='success_probability') * 100
+
+    fig = go.Figure(go.Heatmap(
+        x=surface.columns,
+        y=surface.index,
+        z=surface.values,
+        zmin=0,
+        zmax=100,
+        colorscale=[[0, '#DC0083'], [0.5, '#C8ACD6'], [1, '#6C946F']],
+        colorbar=dict(title='Success %'),
+        hovertemplate='Budget: $%{x:,.0f}<br>Runtime: %{y} min<br>Success: %{z:.1f}%<extra></extra>'
+    ))
+    fig.update_layout(
+        title={
+            'text': f'Success Probability for {genres}, Age {age_rating}',
+            'font': {'color': 'black'},
+            'x': 0.5,
+            'xanchor': 'center'
+        },
+        xaxis_title={
+            'text': 'Production Budget in US$',
+            'font': {'color': 'black'}
+        },
+        yaxis_title={
+            'text': 'Runtime in min',
+            'font': {'color': 'black'}
+        },
+        width=1745,
+        height=600,
+        plot_bgcolor='white',
+        paper_bgcolor='white'
+    )
+    fig.update_xaxes(tickfont=dict(color='black'))
+    fig.update_yaxes(tickfont=dict(color='black'))
+    return fig
@@ -0,0 +1,166 @@
+import numpy as np
+import pandas as pd
+from scipy.signal import find_peaks
+
+# Structure of the per-scene sentiment arc: rolling statistics, segments of steady sentiment,
+# act boundaries and the major turning points. Every segment statistic is a difference of prefix
+# sums, so the rolling window is O(n) and a change point search step is one vectorized pass.
+
+# scenes in the centered rolling window, long scripts use a window of ROLLING_SHARE of their scenes
+ROLLING_WINDOW = 9
+ROLLING_SHARE = 0.04
+# scenes a segment needs at least
+MIN_SEGMENT = 5
+# act boundaries are the strongest changes of a three act split
+ACT_COUNT = 3
+
+
+def prefix_sums(values):
+    values = np.asarray(values, dtype=np.float64)
+    sums = np.concatenate(([0.0], np.cumsum(values)))
+    squares = np.concatenate(([0.0], np.cumsum(values * values)))
+    return sums, squares
+
+
+# Mean and standard deviation over a centered window, shorter at both ends of the arc
+def rolling_stats(values, window=ROLLING_WINDOW):
+    sums, squares = prefix_sums(values)
+    n = len(values)
+    half = window // 2
+    position = np.arange(n)
+    start = np.maximum(position - half, 0)
+    end = np.minimum(position + half + 1, n)
+    count = end - start
+    mean = (sums[end] - sums[start]) / count
+    variance = np.maximum((squares[end] - squares[start]) / count - mean * mean, 0.0)
+    return mean, np.sqrt(variance)
+
+
+# Squared error of values[start:end] around their mean, for an array of starts and one end or the reverse
+def segment_cost(sums, squares, start, end):
+    count = end - start
+    total = sums[end] - sums[start]
+    return squares[end] - squares[start] - total * total / count
+
+
+# Scene to scene noise from the median absolute first difference, robust against the level shifts
+def noise_variance(values):
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) < 3:
+        return float(np.var(values))
+    differences = np.diff(values)
+    sigma = 1.4826 * np.median(np.abs(differences - np.median(differences))) / np.sqrt(2)
+    return float(sigma * sigma) if sigma > 0 else float(np.var(values))
+
+
+def default_penalty(values):
+    return 2 * max(noise_variance(values), 1e-6) * np.log(max(len(values), 2))
+
+
+# Optimal change points under a per change penalty (PELT), positions where a new segment starts
+def pelt(values, penalty=None, min_size=MIN_SEGMENT):
+    n = len(values)
+    if n < 2 * min_size:
+        return []
+    penalty = default_penalty(values) if penalty is None else penalty
+    sums, squares = prefix_sums(values)
+    best = np.full(n + 1, np.inf)
+    best[0] = -penalty
+    previous = np.zeros(n + 1, dtype=np.int64)
+    # candidate starts fill the front of preallocated rows with the prefix sums and best cost up to
+    # each start, so a step reads contiguous slices and pruning compacts the rows in place
+    table = np.empty((4, n + 1))
+    table[:, 0] = (0, best[0], 0.0, 0.0)
+    count = 1
+
+    for end in range(min_size, n + 1):
+        # a segment ending here may start min_size scenes back at the latest
+        start = end - min_size
+        if start >= min_size:
+            table[:, count] = (start, best[start], sums[start], squares[start])
+            count += 1
+        starts, start_best, start_sums, start_squares = table[:, :count]
+        total = sums[end] - start_sums
+        costs = start_best + (squares[end] - start_squares - total * total / (end - starts))
+        i = int(np.argmin(costs))
+        best[end] = costs[i] + penalty
+        previous[end] = int(starts[i])
+        # starts that cannot beat the best one here will never be optimal later either
+        keep = costs <= best[end]
+        kept = int(np.count_nonzero(keep))
+        if kept < count:
+            table[:, :kept] = table[:, :count][:, keep]
+            count = kept
+
+    change_points = []
+    end = previous[n]
+    while end > 0:
+        change_points.append(int(end))
+        end = previous[end]
+    return change_points[::-1]
+
+
+# The strongest change points one split at a time, for a fixed number of segments
+def binary_segmentation(values, n_change_points, min_size=MIN_SEGMENT):
+    sums, squares = prefix_sums(values)
+    segments = [(0, len(values))]
+    change_points = []
+    for _ in range(n_change_points):
+        best_gain, best_split, best_segment = 0.0, None, None
+        for segment in segments:
+            start, end = segment
+            splits = np.arange(start + min_size, end - min_size + 1)
+            if not len(splits):
+                continue
+            gains = (segment_cost(sums, squares, start, end) - segment_cost(sums, squares, start, splits)
+                     - segment_cost(sums, squares, splits, end))
+            i = int(np.argmax(gains))
+            if gains[i] > best_gain:
+                best_gain, best_split, best_segment = gains[i], int(splits[i]), segment
+        if best_split is None:
+            break
+        segments.remove(best_segment)
+        segments += [(best_segment[0], best_split), (best_split, best_segment[1])]
+        change_points.append(best_split)
+    return sorted(change_points)
+
+
+def segment_table(values, change_points, scenes=None):
+    values = np.asarray(values, dtype=np.float64)
+    scenes = np.arange(len(values)) if scenes is None else np.asarray(scenes)
+    sums, squares = prefix_sums(values)
+    bounds = np.array([0] + list(change_points) + [len(values)])
+    start, end = bounds[:-1], bounds[1:]
+    mean = (sums[end] - sums[start]) / (end - start)
+    variance = np.maximum((squares[end] - squares[start]) / (end - start) - mean * mean, 0.0)
+    return pd.DataFrame({'Start': scenes[start], 'End': scenes[end - 1], 'Scenes': end - start,
+                         'Mean': mean, 'Std': np.sqrt(variance)})
+
+
+# Peaks and troughs of the smoothed arc that rise at least prominence above their surroundings
+def turning_points(smoothed, scenes=None, prominence=None, min_distance=MIN_SEGMENT):
+    smoothed = np.asarray(smoothed, dtype=np.float64)
+    scenes = np.arange(len(smoothed)) if scenes is None else np.asarray(scenes)
+    if prominence is None:
+        prominence = max(smoothed.std(), 1e-9)
+    rows = []
+    for kind, sign in (('peak', 1), ('trough', -1)):
+        positions, properties = find_peaks(sign * smoothed, prominence=prominence, distance=min_distance)
+        rows.append(pd.DataFrame({'Scene': scenes[positions], 'Kind': kind, 'Compound': smoothed[positions],
+                                  'Prominence': properties['prominences']}))
+    return pd.concat(rows, ignore_index=True).sort_values('Scene', ignore_index=True)
+
+
+# Everything the sentiment chart overlays, from the per-scene scores of the draft analysis
+def analyze_arc(sentiment, window=None, penalty=None, min_size=MIN_SEGMENT, acts=ACT_COUNT):
+    values = sentiment['Compound'].to_numpy(dtype=np.float64)
+    scenes = sentiment['Scene'].to_numpy()
+    if window is None:
+        window = max(ROLLING_WINDOW, int(len(values) * ROLLING_SHARE) | 1)
+    mean, std = rolling_stats(values, window)
+    return {
+        'rolling': pd.DataFrame({'Scene': scenes, 'Rolling Mean': mean, 'Rolling Std': std}),
+        'segments': segment_table(values, pelt(values, penalty, min_size), scenes),
+        'acts': segment_table(values, binary_segmentation(values, acts - 1, min_size), scenes),
+        'turning_points': turning_points(mean, scenes, min_distance=min_size)
+    }
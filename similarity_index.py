@@ -0,0 +1,110 @@
+import argparse
+import os
+import numpy as np
+import pandas as pd
+
+# Comparable films: nearest reference screenplays by LSA and GloVe cosine similarity.
+# Usage: python similarity_index.py data/feature_store.parquet --output data/similarity_index.npz
+
+INDEX_PATH = os.path.join('data', 'similarity_index.npz')
+# libraries larger than this are searched through the random projection first
+APPROXIMATE_THRESHOLD = 50000
+
+
+def normalize_rows(matrix):
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+
+
+def top_k(scores, k):
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.array([], dtype=np.intp)
+    candidates = np.argpartition(-scores, k - 1)[:k]
+    return candidates[np.argsort(-scores[candidates])]
+
+
+class SimilarityIndex:
+
+    def __init__(self, titles, lsa, glove, projection=None, projected=None):
+        self.titles = np.asarray(titles)
+        self.lsa = lsa
+        self.glove = glove
+        # both halves are unit vectors scaled by sqrt(0.5), one dot product gives the mean cosine
+        self.combined = np.hstack((lsa, glove)) * np.float32(np.sqrt(0.5))
+        self.projection = projection
+        self.projected = projected
+
+    @classmethod
+    def from_vectors(cls, titles, lsa_vectors, glove_vectors, projection_dim=None, seed=42):
+        lsa = normalize_rows(lsa_vectors)
+        glove = normalize_rows(glove_vectors)
+        projection = projected = None
+        if projection_dim:
+            rng = np.random.default_rng(seed)
+            dim = lsa.shape[1] + glove.shape[1]
+            projection = (rng.standard_normal((dim, projection_dim)) / np.sqrt(projection_dim)).astype(np.float32)
+            projected = (np.hstack((lsa, glove)) * np.float32(np.sqrt(0.5))) @ projection
+        return cls(titles, lsa, glove, projection, projected)
+
+    @classmethod
+    def from_feature_store(cls, store, projection_dim=None):
+        lsa_columns = [column for column in store.columns if column.startswith('lsa_')]
+        glove_columns = [column for column in store.columns if column.startswith('glove_')]
+        titles = [os.path.splitext(os.path.basename(script))[0] for script in store['script']]
+        return cls.from_vectors(titles, store[lsa_columns].to_numpy(), store[glove_columns].to_numpy(), projection_dim)
+
+    @classmethod
+    def load(cls, path=INDEX_PATH):
+        with np.load(path, allow_pickle=False) as data:
+            projection = data['projection'] if 'projection' in data else None
+            projected = data['projected'] if 'projected' in data else None
+            return cls(data['titles'], data['lsa'], data['glove'], projection, projected)
+
+    def save(self, path=INDEX_PATH):
+        arrays = {'titles': self.titles.astype(str), 'lsa': self.lsa, 'glove': self.glove}
+        if self.projection is not None:
+            arrays['projection'] = self.projection
+            arrays['projected'] = self.projected
+        np.savez(path, **arrays)
+
+    def __len__(self):
+        return len(self.titles)
+
+    def query(self, lsa_vector, glove_vector, k=5, approximate=None):
+        lsa = normalize_rows(np.reshape(lsa_vector, (1, -1)))[0]
+        glove = normalize_rows(np.reshape(glove_vector, (1, -1)))[0]
+        query = np.concatenate((lsa, glove)) * np.float32(np.sqrt(0.5))
+
+        if approximate is None:
+            approximate = self.projection is not None and len(self) > APPROXIMATE_THRESHOLD
+        if approximate and self.projection is not None:
+            # shortlist in the projected space, then rerank the shortlist exactly
+            shortlist = top_k(self.projected @ (query @ self.projection), max(k * 20, 100))
+            best = shortlist[top_k(self.combined[shortlist] @ query, k)]
+        else:
+            best = top_k(self.combined @ query, k)
+
+        return pd.DataFrame({
+            'title': self.titles[best],
+            'similarity': self.combined[best] @ query,
+            'lsa_similarity': self.lsa[best] @ lsa,
+            'glove_similarity': self.glove[best] @ glove
+        })
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the comparable films index from a feature store.')
+    parser.add_argument('feature_store', help='parquet file written by feature_store.py')
+    parser.add_argument('--output', default=INDEX_PATH)
+    parser.add_argument('--projection-dim', type=int, default=None,
+                        help='add a random projection for approximate search on large libraries')
+    args = parser.parse_args()
+
+    index = SimilarityIndex.from_feature_store(pd.read_parquet(args.feature_store), args.projection_dim)
+    index.save(args.output)
+    print(f"Indexed {len(index)} screenplays in {args.output}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,228 @@
+import argparse
+import io
+import json
+import time
+from collections import Counter
+import numpy as np
+import pandas as pd
+from PIL import Image
+
+# Analysis snapshots: everything the Home page and the dashboard show for a script, in one
+# compressed .npz file. Arrays and table columns are stored as NumPy arrays, text columns as one
+# UTF-8 buffer with offsets, and a JSON manifest with the schema version describes how to put the
+# session state back together. Loading never pickles and never runs the NLP pipeline.
+# Usage: python snapshot.py analysis.npz   show what a snapshot contains
+
+SNAPSHOT_VERSION = 1
+# session state entries that make up an analysis
+SNAPSHOT_KEYS = ['prediction', 'sweep', 'dashboard_results']
+# fields the pages read from a restored entry, with the types they expect
+REQUIRED_FIELDS = {
+    'prediction': {'file_name': str, 'features': pd.DataFrame, 'probabilities': np.ndarray, 'lsa': np.ndarray,
+                   'glove': np.ndarray},
+    'dashboard_results': {'file_name': str, 'networks': dict, 'network_metrics': dict, 'scene_interactions': pd.DataFrame,
+                          'sentiment': pd.DataFrame, 'scene_embeddings': np.ndarray, 'drafts': list,
+                          'wordcloud': (Image.Image, type(None)), 'downgrade_reasons': list, 'memory_report': pd.DataFrame}
+}
+REQUIRED_COLUMNS = {
+    'sweep': ['genres', 'age_rating', 'production_budget', 'runtime_minutes', 'success_probability'],
+    'sentiment': ['Scene', 'Compound'],
+    'scene_interactions': ['Scene', 'Interaction Count']
+}
+DRAFT_FIELDS = ['digest', 'digests', 'scenes', 'scene_scores', 'sentiment', 'scene_length_cv', 'interaction_matrix', 'recomputed']
+
+
+class SnapshotError(ValueError):
+    pass
+
+
+def _store(array, arrays):
+    key = f'a{len(arrays)}'
+    arrays[key] = array
+    return key
+
+
+def _pack_strings(values, arrays):
+    encoded = [b'' if value is None else value.encode('utf-8') for value in values]
+    offsets = np.cumsum([0] + [len(value) for value in encoded], dtype=np.int64)
+    packed = {'strings': _store(np.frombuffer(b''.join(encoded), dtype=np.uint8), arrays),
+              'offsets': _store(offsets, arrays)}
+    missing = np.array([value is None for value in values], dtype=bool)
+    if missing.any():
+        packed['missing'] = _store(missing, arrays)
+    return packed
+
+
+def _pack_array(array, arrays):
+    array = np.asarray(array)
+    if array.dtype.kind in 'biufc':
+        return {'array': _store(array, arrays)}
+    values = array.ravel().tolist()
+    if array.ndim == 1 and all(value is None or isinstance(value, str) for value in values):
+        return _pack_strings(values, arrays)
+    # mixed object columns are rare and small, they go into the manifest
+    return {'values': [_pack(value, arrays) for value in values], 'shape': list(array.shape)}
+
+
+def _pack(value, arrays):
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, pd.DataFrame):
+        # the default index is not stored
+        index = None
+        if not value.index.equals(pd.RangeIndex(len(value))):
+            index = _pack_array(value.index.to_numpy(), arrays)
+        return {'frame': [[_pack(column, arrays), _pack_array(value[column].to_numpy(), arrays)] for column in value.columns],
+                'index': index, 'rows': len(value)}
+    if isinstance(value, np.ndarray):
+        return _pack_array(value, arrays)
+    if isinstance(value, Image.Image):
+        return {'image': _store(np.asarray(value), arrays), 'mode': value.mode}
+    if isinstance(value, Counter):
+        return {'counter': [[_pack(key, arrays), _pack(count, arrays)] for key, count in value.items()]}
+    if isinstance(value, dict):
+        return {'dict': [[_pack(key, arrays), _pack(item, arrays)] for key, item in value.items()]}
+    if isinstance(value, tuple):
+        return {'tuple': [_pack(item, arrays) for item in value]}
+    if isinstance(value, list):
+        return {'list': [_pack(item, arrays) for item in value]}
+    raise SnapshotError(f"Cannot store a {type(value).__name__} in a snapshot")
+
+
+def _unpack_array(packed, data):
+    if 'array' in packed:
+        return data[packed['array']]
+    if 'values' in packed:
+        values = np.empty(len(packed['values']), dtype=object)
+        for i, value in enumerate(packed['values']):
+            values[i] = _unpack(value, data)
+        return values.reshape(packed['shape'])
+    buffer = data[packed['strings']].tobytes()
+    offsets = data[packed['offsets']]
+    values = np.array([buffer[start:end].decode('utf-8') for start, end in zip(offsets[:-1], offsets[1:])], dtype=object)
+    if 'missing' in packed:
+        values[data[packed['missing']]] = None
+    return values
+
+
+def _unpack(packed, data):
+    if not isinstance(packed, dict):
+        return packed
+    if 'frame' in packed:
+        index = None if packed['index'] is None else _unpack_array(packed['index'], data)
+        columns = [_unpack(column, data) for column, _ in packed['frame']]
+        frame = pd.DataFrame({i: _unpack_array(values, data) for i, (_, values) in enumerate(packed['frame'])},
+                             index=index if index is not None else pd.RangeIndex(packed['rows']))
+        frame.columns = columns
+        return frame
+    if 'image' in packed:
+        return Image.fromarray(data[packed['image']]).convert(packed['mode'])
+    if 'counter' in packed:
+        return Counter({_unpack(key, data): _unpack(count, data) for key, count in packed['counter']})
+    if 'dict' in packed:
+        return {_unpack(key, data): _unpack(item, data) for key, item in packed['dict']}
+    if 'tuple' in packed:
+        return tuple(_unpack(item, data) for item in packed['tuple'])
+    if 'list' in packed:
+        return [_unpack(item, data) for item in packed['list']]
+    return _unpack_array(packed, data)
+
+
+# The analysis entries of a session state, None when there is nothing to export yet
+def snapshot_state(session_state):
+    state = {key: session_state[key] for key in SNAPSHOT_KEYS if session_state.get(key) is not None}
+    return state or None
+
+
+def export_snapshot(state):
+    arrays = {}
+    manifest = {'version': SNAPSHOT_VERSION, 'created': time.time(), 'state': _pack(state, arrays)}
+    buffer = io.BytesIO()
+    np.savez_compressed(buffer, manifest=np.array(json.dumps(manifest)), **arrays)
+    return buffer.getvalue()
+
+
+def _require(condition, message):
+    if not condition:
+        raise SnapshotError(message)
+
+
+def read_manifest(data):
+    try:
+        with np.load(io.BytesIO(data), allow_pickle=False) as arrays:
+            manifest = json.loads(str(arrays['manifest']))
+    except Exception as e:
+        # truncated archives raise zipfile.BadZipFile, other files OSError or ValueError
+        raise SnapshotError(f"Not an analysis snapshot ({type(e).__name__}: {e})")
+    _require(isinstance(manifest, dict), "Not an analysis snapshot (the manifest is not an object)")
+    if manifest.get('version') != SNAPSHOT_VERSION:
+        raise SnapshotError(f"Snapshot version {manifest.get('version')} is not supported, expected {SNAPSHOT_VERSION}")
+    return manifest
+
+
+def _require_columns(frame, name):
+    missing = [column for column in REQUIRED_COLUMNS[name] if column not in frame.columns]
+    _require(not missing, f"'{name}' has no column {', '.join(map(str, missing))}")
+
+
+# Raises SnapshotError unless every entry has what the pages read from it
+def validate_state(state):
+    _require(isinstance(state, dict) and state, "The snapshot holds no analysis")
+    unknown = [key for key in state if key not in SNAPSHOT_KEYS]
+    _require(not unknown, f"Unknown entries {', '.join(map(str, unknown))}")
+    for key, value in state.items():
+        if key == 'sweep':
+            _require(isinstance(value, pd.DataFrame), "'sweep' is not a table")
+            _require_columns(value, 'sweep')
+            continue
+        _require(isinstance(value, dict), f"'{key}' is not a dict")
+        for field, kind in REQUIRED_FIELDS[key].items():
+            _require(field in value, f"'{key}' has no '{field}'")
+            _require(isinstance(value[field], kind), f"'{key}.{field}' is a {type(value[field]).__name__}")
+    if 'prediction' in state:
+        _require(state['prediction']['probabilities'].shape == (2,), "'prediction.probabilities' needs two classes")
+    if 'dashboard_results' in state:
+        results = state['dashboard_results']
+        _require_columns(results['sentiment'], 'sentiment')
+        _require_columns(results['scene_interactions'], 'scene_interactions')
+        for draft in results['drafts']:
+            _require(isinstance(draft, dict) and all(field in draft for field in DRAFT_FIELDS), "A draft is incomplete")
+
+
+# Session state entries of a snapshot, raises SnapshotError for other files, other versions and
+# snapshots that do not restore to what the pages expect
+def import_snapshot(data):
+    manifest = read_manifest(data)
+    try:
+        with np.load(io.BytesIO(data), allow_pickle=False) as arrays:
+            state = _unpack(manifest['state'], {key: arrays[key] for key in arrays.files})
+    except Exception as e:
+        raise SnapshotError(f"Damaged snapshot ({type(e).__name__}: {e})")
+    validate_state(state)
+    return state
+
+
+def describe(state):
+    rows = []
+    for key, value in state.items():
+        file_name = value.get('file_name') if isinstance(value, dict) else None
+        rows.append({'entry': key, 'file_name': file_name,
+                     'contents': ', '.join(value) if isinstance(value, dict) else f'{len(value)} rows'})
+    return pd.DataFrame(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Show the contents of an analysis snapshot.')
+    parser.add_argument('snapshot', help='snapshot file exported from the app')
+    args = parser.parse_args()
+
+    with open(args.snapshot, 'rb') as f:
+        data = f.read()
+    manifest = read_manifest(data)
+    print(f"Snapshot version {manifest['version']}, created {time.ctime(manifest['created'])}, {len(data) / 1024:.1f} KB")
+    print(describe(import_snapshot(data)).to_string(index=False))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,240 @@
+import argparse
+import hashlib
+import json
+import os
+import numpy as np
+import pandas as pd
+
+# Gradient boosted trees as flat NumPy arrays. The XGBoost classifiers are exported once,
+# serving then walks all trees of a batch level by level without DataFrame validation,
+# DMatrix construction or importing xgboost at all.
+# Usage: python tree_ensemble.py --models models           export the classifiers
+#        python tree_ensemble.py --models models --check   compare the exports with the pickles
+
+# pickled XGBoost classifiers that get an exported .npz next to them
+TREE_MODELS = ['clf_tfidf', 'clf_glove', 'clf_lsa', 'clf_combined', 'clf_stack']
+# allowed probability difference to XGBoost, the trees sum float32 leaves in a different order
+CHECK_TOLERANCE = 1e-6
+
+
+def file_digest(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def _logit(probability):
+    return float(np.log(probability / (1 - probability)))
+
+
+class TreeEnsemble:
+
+    def __init__(self, feature, threshold, left, right, default_left, value, roots, base_margin,
+                 num_features, feature_names=None, missing=np.nan, source_digest=''):
+        # one entry per node of all trees, children are global node ids and leaves have feature -1
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.default_left = default_left
+        self.value = value
+        self.roots = roots
+        self.base_margin = base_margin
+        self.num_features = num_features
+        self.feature_names = feature_names
+        self.missing = missing
+        self.source_digest = source_digest
+        self.classes_ = np.array([0, 1])
+
+    # Only plain binary:logistic gbtree models with numerical splits, which is what the app trains
+    @classmethod
+    def from_xgboost(cls, model, source_digest=''):
+        booster = model.get_booster()
+        config = json.loads(booster.save_config())
+        objective = config['learner']['objective']['name']
+        if objective != 'binary:logistic':
+            raise ValueError(f"Unsupported objective {objective}")
+        raw = json.loads(booster.save_raw('json'))['learner']
+        trees = raw['gradient_booster']['model']['trees']
+        best_iteration = booster.attributes().get('best_iteration')
+        if best_iteration is not None:
+            trees = trees[:int(best_iteration) + 1]
+
+        feature, threshold, left, right, default_left, value, roots = [], [], [], [], [], [], []
+        offset = 0
+        for tree in trees:
+            if any(tree['split_type']):
+                raise ValueError("Categorical splits are not supported")
+            left_children = np.asarray(tree['left_children'], dtype=np.int32)
+            leaf = left_children == -1
+            feature.append(np.where(leaf, -1, tree['split_indices']).astype(np.int32))
+            # leaves keep their weight in split_conditions
+            threshold.append(np.asarray(tree['split_conditions'], dtype=np.float32))
+            value.append(np.where(leaf, tree['split_conditions'], 0).astype(np.float32))
+            # leaves point at themselves, so a finished row stays put while deeper rows keep walking
+            node_ids = np.arange(len(left_children), dtype=np.int32) + offset
+            left.append(np.where(leaf, node_ids, left_children + offset))
+            right.append(np.where(leaf, node_ids, np.asarray(tree['right_children'], dtype=np.int32) + offset))
+            default_left.append(np.asarray(tree['default_left'], dtype=bool))
+            roots.append(offset)
+            offset += len(left_children)
+
+        missing = model.missing if model.missing is not None else np.nan
+        return cls(np.concatenate(feature), np.concatenate(threshold), np.concatenate(left).astype(np.int32),
+                   np.concatenate(right).astype(np.int32), np.concatenate(default_left), np.concatenate(value),
+                   np.asarray(roots, dtype=np.int32), _logit(float(raw['learner_model_param']['base_score'])),
+                   booster.num_features(), booster.feature_names, float(missing), source_digest)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            feature_names = list(data['feature_names']) if 'feature_names' in data else None
+            return cls(data['feature'], data['threshold'], data['left'], data['right'], data['default_left'],
+                       data['value'], data['roots'], float(data['base_margin']), int(data['num_features']),
+                       feature_names, float(data['missing']), str(data['source_digest']))
+
+    def save(self, path):
+        arrays = {
+            'feature': self.feature, 'threshold': self.threshold, 'left': self.left, 'right': self.right,
+            'default_left': self.default_left, 'value': self.value, 'roots': self.roots,
+            'base_margin': self.base_margin, 'num_features': self.num_features,
+            'missing': self.missing, 'source_digest': self.source_digest
+        }
+        if self.feature_names is not None:
+            arrays['feature_names'] = np.asarray(self.feature_names, dtype=str)
+        np.savez(path, **arrays)
+
+    # float32 rows like the DMatrix; absent entries of a sparse matrix are missing, not zero
+    def _as_array(self, X):
+        if hasattr(X, 'tocoo'):
+            coo = X.tocoo()
+            rows = np.full(coo.shape, np.nan, dtype=np.float32)
+            rows[coo.row, coo.col] = coo.data
+        else:
+            if isinstance(X, pd.DataFrame) and self.feature_names is not None and list(X.columns) != self.feature_names:
+                # the first column that differs, a full list of a few hundred names is unreadable
+                position = next((i for i, (name, expected) in enumerate(zip(X.columns, self.feature_names)) if name != expected),
+                                min(len(X.columns), len(self.feature_names)))
+                got = X.columns[position] if position < len(X.columns) else None
+                expected = self.feature_names[position] if position < len(self.feature_names) else None
+                raise ValueError(f"Feature names do not match the model at column {position}: expected {expected}, got {got}")
+            rows = np.array(X.to_numpy() if isinstance(X, pd.DataFrame) else X, dtype=np.float32, ndmin=2)
+            if not np.isnan(self.missing):
+                rows[rows == self.missing] = np.nan
+        if rows.shape[1] != self.num_features:
+            raise ValueError(f"Expected {self.num_features} features, got {rows.shape[1]}")
+        return rows
+
+    def predict_margin(self, X):
+        rows = self._as_array(X)
+        row_ids = np.arange(len(rows))[:, np.newaxis]
+        nodes = np.broadcast_to(self.roots, (len(rows), len(self.roots))).copy()
+        while True:
+            feature = self.feature[nodes]
+            split = feature >= 0
+            if not split.any():
+                break
+            x = rows[row_ids, np.maximum(feature, 0)]
+            go_left = np.where(np.isnan(x), self.default_left[nodes], x < self.threshold[nodes])
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        return self.value[nodes].sum(axis=1, dtype=np.float64) + self.base_margin
+
+    # same layout as XGBClassifier.predict_proba: one [class 0, class 1] row per input row
+    def predict_proba(self, X):
+        probability = 1 / (1 + np.exp(-self.predict_margin(X)))
+        return np.column_stack((1 - probability, probability))
+
+
+def model_feature_names(model):
+    if isinstance(model, TreeEnsemble):
+        return model.feature_names
+    return model.get_booster().feature_names
+
+
+def export_path(model_dir, name):
+    return os.path.join(model_dir, f'{name}.npz')
+
+
+# Exported trees of a pickled classifier, None when there is no export or it is older than the pickle
+def load_exported(model_dir, name, pickle_path):
+    path = export_path(model_dir, name)
+    if not os.path.exists(path):
+        return None
+    ensemble = TreeEnsemble.load(path)
+    if ensemble.source_digest != file_digest(pickle_path):
+        print(f"Ignoring {path}, it was exported from a different {os.path.basename(pickle_path)}")
+        return None
+    return ensemble
+
+
+def export_models(model_dir='models'):
+    import pickle
+    exported = []
+    for name in TREE_MODELS:
+        pickle_path = os.path.join(model_dir, f'{name}.pkl')
+        with open(pickle_path, 'rb') as f:
+            model = pickle.load(f)
+        TreeEnsemble.from_xgboost(model, file_digest(pickle_path)).save(export_path(model_dir, name))
+        exported.append(name)
+    return exported
+
+
+# Random rows around the split thresholds of every feature, so that both branches of the splits are taken
+def random_rows(ensemble, n_rows, rng):
+    rows = rng.normal(size=(n_rows, ensemble.num_features)).astype(np.float32)
+    split = ensemble.feature >= 0
+    for feature in np.unique(ensemble.feature[split]):
+        thresholds = ensemble.threshold[split & (ensemble.feature == feature)]
+        rows[:, feature] = rng.choice(thresholds, n_rows) + rng.normal(scale=thresholds.std() + 1e-3, size=n_rows)
+    return rows
+
+
+# Largest probability difference between the flat trees and the pickled XGBClassifier, for dense rows
+# with missing values and for sparse rows whose absent entries are missing
+def check_models(model_dir='models', n_rows=2000, missing_share=0.2, density=0.1, seed=0):
+    import pickle
+    from scipy import sparse
+    rng = np.random.default_rng(seed)
+    results = []
+    for name in TREE_MODELS:
+        pickle_path = os.path.join(model_dir, f'{name}.pkl')
+        with open(pickle_path, 'rb') as f:
+            model = pickle.load(f)
+        ensembles = {'converted': TreeEnsemble.from_xgboost(model)}
+        exported = load_exported(model_dir, name, pickle_path)
+        if exported is not None:
+            ensembles['exported'] = exported
+        rows = random_rows(ensembles['converted'], n_rows, rng)
+        dense = rows.copy()
+        dense[rng.random(dense.shape) < missing_share] = np.nan
+        inputs = {
+            'dense': pd.DataFrame(dense, columns=model_feature_names(model)),
+            'sparse': sparse.csr_matrix(np.where(rng.random(rows.shape) < density, rows, 0))
+        }
+        for input_name, X in inputs.items():
+            expected = model.predict_proba(X)
+            for source, ensemble in ensembles.items():
+                difference = np.abs(ensemble.predict_proba(X) - expected).max()
+                results.append({'model': name, 'source': source, 'input': input_name, 'rows': n_rows,
+                                'max_abs_diff': difference, 'ok': difference <= CHECK_TOLERANCE})
+    return pd.DataFrame(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export the pickled XGBoost classifiers to flat tree arrays.')
+    parser.add_argument('--models', default='models', help='directory with the pickled models')
+    parser.add_argument('--check', action='store_true', help='compare with XGBClassifier.predict_proba instead of exporting')
+    parser.add_argument('--rows', type=int, default=2000, help='random rows per model and input type for --check')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    if args.check:
+        results = check_models(args.models, args.rows, seed=args.seed)
+        print(results.to_string(index=False))
+        if not results['ok'].all():
+            raise SystemExit(f"Probabilities differ by more than {CHECK_TOLERANCE}")
+        return
+    for name in export_models(args.models):
+        print(f"Exported {name} to {export_path(args.models, name)}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,212 @@
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import traceback
+
+# Opt-in warm-up: loads every model, GloVe and spaCy and sends a tiny synthetic screenplay
+# through the whole pipeline in a background thread, so the first visitor after a deploy does
+# not pay for it. The readiness state is kept in memory for the pages and written to a file
+# that health checks can test.
+# Every worker writes its own file, named after its server port, and records its pid in it.
+# Usage: python warmup.py serve [streamlit options]   start the app with the warm-up running
+#        python warmup.py check [port]                exit code 0 once the worker is warm
+
+WARMUP_ENABLED = os.environ.get('REEL_WARMUP', '0') == '1'
+
+
+def ready_file(port=None):
+    port = port or os.environ.get('STREAMLIT_SERVER_PORT', '8501')
+    return os.environ.get('REEL_READY_FILE', os.path.join(tempfile.gettempdir(), f'reel_insights.{port}.ready'))
+
+
+# Start time of a process in clock ticks since boot, tells a restarted worker from one that reuses the pid
+def process_start(pid):
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            # the command name in parentheses may contain spaces
+            return int(f.read().rsplit(')', 1)[1].split()[19])
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+READY_FILE = ready_file()
+
+_lock = threading.Lock()
+_thread = None
+_state = {'status': 'idle', 'step': None, 'steps': [], 'started': None, 'finished': None, 'error': None,
+          'pid': os.getpid(), 'process_start': process_start(os.getpid())}
+
+
+CHARACTERS = ['ANNA', 'BEN', 'CLAIRE', 'DANIEL', 'ELENA', 'FRANK']
+LINES = ['We should not be here this late.', 'Then why did you come back?', 'Nobody saw me leave.',
+         'You promised this would be the last time.', 'Keep your voice down.', 'I found the letter.']
+PLACES = ['INT. WAREHOUSE', 'EXT. HARBOUR', 'INT. DINER', 'EXT. ROOFTOP']
+DESCRIPTIONS = ['A single bulb swings above the crates.', 'Rain hammers on the windows.', 'Sirens wail in the distance.']
+
+
+# A small screenplay in the format the parser expects, the seed varies places, speakers and lines
+def synthetic_screenplay(scenes=3, seed=0):
+    rng = random.Random(seed)
+    lines = ['']
+    for scene in range(scenes):
+        lines += [f'{rng.choice(PLACES)} {scene} - {rng.choice(["DAY", "NIGHT"])}', '', rng.choice(DESCRIPTIONS), '']
+        speakers = rng.sample(CHARACTERS, 2)
+        for turn in range(3):
+            for speaker in speakers:
+                lines += [speaker, rng.choice(LINES), '']
+    return '\n'.join(lines)
+
+
+def _load_models():
+    import resources
+    resources.load_models()
+
+def _load_embeddings():
+    import resources
+    _, _, matrix = resources.load_embeddings()
+    # one pass over the matrix brings every page of the vectors into memory
+    float(matrix.sum())
+
+def _load_spacy():
+    import resources
+    resources.load_spacy()('Warm up the tagger and the entity recognizer.')
+
+def _touch_nltk():
+    import screenplay_features
+    # punkt and wordnet are loaded lazily on first use
+    screenplay_features.ensure_nltk_loaded()
+
+def _run_pipeline():
+    import draft_analysis
+    import feature_graph
+    import resources
+    import screenplay_features
+    models = resources.load_models()
+    embeddings_index, vocabulary, matrix = resources.load_embeddings()
+    raw_text = synthetic_screenplay()
+    scene_separated_text = screenplay_features.process_screenplay(raw_text)
+    draft = draft_analysis.analyze_draft(scene_separated_text)
+    text_features = feature_graph.extract_text_features(raw_text, models, embeddings_index, scene_separated_text, draft['scene_scores'])
+    df = screenplay_features.build_feature_frame(text_features['script_features'], 10_000_000, ['Drama'], '13', 100)
+    feature_graph.predict_success(text_features, df, models)
+    screenplay_features.get_scene_embeddings(scene_separated_text.split(draft_analysis.SCENE_SEPARATOR), vocabulary, matrix)
+
+STEPS = [
+    ('models', _load_models),
+    ('embeddings', _load_embeddings),
+    ('spacy', _load_spacy),
+    ('nltk', _touch_nltk),
+    ('pipeline', _run_pipeline)
+]
+
+
+def _update(**changes):
+    with _lock:
+        _state.update(changes)
+        state = json.loads(json.dumps(_state))
+    try:
+        with open(READY_FILE + '.tmp', 'w') as f:
+            json.dump(state, f)
+        os.replace(READY_FILE + '.tmp', READY_FILE)
+    except OSError:
+        pass
+
+
+# a restarted or crashed worker must not leave the ready state of its predecessor behind
+if WARMUP_ENABLED:
+    _update()
+
+
+def run_warmup():
+    _update(status='warming', started=time.time(), finished=None, error=None, steps=[])
+    steps = []
+    for name, step in STEPS:
+        _update(step=name)
+        start = time.perf_counter()
+        try:
+            step()
+        except Exception as e:
+            traceback.print_exc()
+            steps.append({'step': name, 'seconds': time.perf_counter() - start})
+            _update(status='failed', step=name, steps=steps, error=f"{type(e).__name__}: {e}", finished=time.time())
+            return False
+        steps.append({'step': name, 'seconds': time.perf_counter() - start})
+        _update(steps=steps)
+    _update(status='ready', step=None, finished=time.time())
+    return True
+
+
+# Starts the warm-up once per process, later calls only report whether it is running
+def start(enabled=None):
+    global _thread
+    enabled = WARMUP_ENABLED if enabled is None else enabled
+    if not enabled:
+        return False
+    with _lock:
+        if _thread is not None:
+            return True
+        _thread = threading.Thread(target=run_warmup, name='warmup', daemon=True)
+    _thread.start()
+    return True
+
+
+def readiness():
+    with _lock:
+        return json.loads(json.dumps(_state))
+
+
+# Without a warm-up every worker counts as ready, as it did before
+def is_ready():
+    return not WARMUP_ENABLED or readiness()['status'] == 'ready'
+
+
+def _alive(pid, started):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # the process exists but belongs to another user
+        pass
+    return started is None or process_start(pid) in (None, started)
+
+
+# A worker is warm when its file says ready and the process that wrote it is still running
+def check(path=None):
+    try:
+        with open(path or READY_FILE) as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return False
+    if state.get('status') != 'ready' or not isinstance(state.get('pid'), int):
+        return False
+    return _alive(state['pid'], state.get('process_start'))
+
+
+def main():
+    command = sys.argv[1] if len(sys.argv) > 1 else 'check'
+    if command == 'check':
+        sys.exit(0 if check(ready_file(sys.argv[2] if len(sys.argv) > 2 else None)) else 1)
+    if command == 'serve':
+        # the ready file is named after the port, Streamlit reads the same variable
+        for i, arg in enumerate(sys.argv[2:], 2):
+            if arg.startswith('--server.port='):
+                os.environ['STREAMLIT_SERVER_PORT'] = arg.split('=', 1)[1]
+            elif arg == '--server.port' and i + 1 < len(sys.argv):
+                os.environ['STREAMLIT_SERVER_PORT'] = sys.argv[i + 1]
+        # the warm-up thread and the Streamlit server share this process and its resource cache;
+        # the pages import this file as the warmup module, which has to hold the state, not __main__
+        os.environ['REEL_WARMUP'] = '1'
+        import warmup
+        warmup.start()
+        from streamlit.web import cli as streamlit_cli
+        sys.argv = ['streamlit', 'run', 'Home.py'] + sys.argv[2:]
+        sys.exit(streamlit_cli.main())
+    sys.exit(f"Unknown command {command}, use serve or check")
+
+if __name__ == '__main__':
+    main()